@@ -1,495 +1,435 @@
-import discord
-from discord.ext import commands, tasks
-from dotenv import load_dotenv
+import time
+STARTED = time.monotonic()  # process start, for the startup metrics
+
 import os
-from datetime import datetime
-import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import pytz
+import socket
+
+from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Claim the health port before the slow imports (discord.py alone takes a few hundred ms) so
+# the host sees it open at once; requests wait in the listen backlog until the server takes over
+PORT = int(os.getenv('PORT', 8000))
+health_socket = health_error = None
+try:
+    health_socket = socket.create_server(('0.0.0.0', PORT), backlog=128)
+except OSError as e:
+    health_error = e
+
+import logging
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import yarl
+
+from schedule import INDEX, MANILA_TZ, SCHEDULE_FILE, delivery_id, format_12h, reminder_id, reminder_message
+from responses import ScheduleResponses
+from scheduler import ReminderScheduler
+from shards import local_channels, parse_shard_ids, resolve_later, shard_label
+from broadcast import DISCORD_API, Broadcaster, RestTransport
+from subscriptions import PersonalDelivery, SubscriptionStore, event_key
+from countdown import CountdownDelivery
+from feed import ScheduleFeed
+from gate import CommandGate
+from journal import DeliveryJournal
+from lease import LeaderLease
+from lifecycle import Lifecycle
+from logs import setup_logging
+from loopwatch import LoopWatchdog, cpu_timer
+from hotreload import ScheduleWatcher
+from health import start_health_server
+import metrics
+
+metrics.STARTUP_SECONDS.set(time.monotonic() - STARTED, stage='imports')
+
+# JSON lines on stdout, written by a background thread so the loop never waits on the pipe
+log_listener = setup_logging(os.getenv('LOG_LEVEL', 'INFO'))
+log = logging.getLogger('bot')
+
 TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 CHANNEL_ID = int(os.getenv('CHANNEL_ID', 1396766554028511372))
+# Every channel that receives reminders (comma-separated), defaults to CHANNEL_ID
+CHANNEL_IDS = [int(c) for c in (os.getenv('CHANNEL_IDS') or str(CHANNEL_ID)).split(',') if c.strip()]
 TIMEZONE = os.getenv('TIMEZONE', 'Europe/Lisbon')  # Follow Lisbon time for notifications
+SCHEDULE_TZ = ZoneInfo(TIMEZONE)
+SUBSCRIPTIONS_DB = os.getenv('SUBSCRIPTIONS_DB', 'subscriptions.db')
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', 'reminders.journal')
+ANNOUNCE_ONLINE = os.getenv('ANNOUNCE_ONLINE', '1').lower() in ('1', 'true', 'yes')
+ANNOUNCE_INTERVAL = int(os.getenv('ANNOUNCE_INTERVAL', 3600))  # seconds between online messages
+# Countdown mode: one message per event per channel, edited at each warning
+COUNTDOWN = os.getenv('COUNTDOWN', '').lower() in ('1', 'true', 'yes')
+# Identical commands in a channel within COALESCE_WINDOW seconds share one reply;
+# USER_COOLDOWN / CHANNEL_COOLDOWN (seconds, 0 = off) cap how often anyone gets one
+COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', 3))
+USER_COOLDOWN = float(os.getenv('USER_COOLDOWN', 0))
+CHANNEL_COOLDOWN = float(os.getenv('CHANNEL_COOLDOWN', 0))
+SCHEDULE_POLL = float(os.getenv('SCHEDULE_POLL', 5))  # seconds between schedules file checks, 0 disables
+GATEWAY_GRACE = float(os.getenv('GATEWAY_GRACE', 300))  # seconds the gateway may be down before /health fails
+
+# Low-footprint mode: slash commands only. Without the message intents Discord
+# stops streaming every guild message to us, and with the message cache and
+# member chunking off we only keep the guild/channel state reminders need.
+LOW_FOOTPRINT = os.getenv('LOW_FOOTPRINT', '').lower() in ('1', 'true', 'yes')
+SYNC_COMMANDS = os.getenv('SYNC_COMMANDS', '1').lower() in ('1', 'true', 'yes')
+
+# Sharding: AUTO_SHARD=1 lets discord.py pick the shard count; SHARD_COUNT plus
+# SHARD_IDS (e.g. "0-3") runs a slice of the shards in this process, which then
+# only delivers reminders to channels in guilds on its own shards.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT') or 0) or None
+SHARD_IDS = parse_shard_ids(os.getenv('SHARD_IDS')) if SHARD_COUNT else None
+AUTO_SHARD = bool(SHARD_COUNT) or os.getenv('AUTO_SHARD', '').lower() in ('1', 'true', 'yes')
+SHARDS = shard_label(SHARD_IDS, SHARD_COUNT)
+OWNS_DMS = SHARD_IDS is None or 0 in SHARD_IDS  # Discord puts DMs on shard 0
+# Replicas pointing at the same LEASE_DB elect one reminder scheduler per shard range
+LEASE_DB = os.getenv('LEASE_DB')
+# REST and gateway URLs; only changed to point the bot at a local fake Discord for load tests
+DISCORD_API = (os.getenv('DISCORD_API') or DISCORD_API).rstrip('/')
+discord.http.Route.BASE = DISCORD_API
+if os.getenv('DISCORD_GATEWAY'):
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(os.getenv('DISCORD_GATEWAY'))
+
+bot_class = commands.AutoShardedBot if AUTO_SHARD else commands.Bot
+shard_options = {'shard_count': SHARD_COUNT, 'shard_ids': SHARD_IDS} if SHARD_COUNT else {}
 
-intents = discord.Intents.default()
-intents.message_content = True  # Enable message content intent for commands
-bot = commands.Bot(command_prefix='!', intents=intents)
+if LOW_FOOTPRINT:
+    intents = discord.Intents.none()
+    # The guild/channel/role cache that slash commands resolve ctx.channel, permissions and
+    # the /subscribe role option against; reminders themselves go over REST
+    intents.guilds = True
+    # Slash commands only: without the message intents no MESSAGE_CREATE arrives,
+    # so no prefix (not even a mention) could ever match
+    bot = bot_class(command_prefix=(), intents=intents,
+                    max_messages=None,
+                    member_cache_flags=discord.MemberCacheFlags.none(),
+                    chunk_guilds_at_startup=False, **shard_options)
+else:
+    intents = discord.Intents.default()
+    intents.message_content = True  # Enable message content intent for commands
+    bot = bot_class(command_prefix='!', intents=intents, **shard_options)
+
+# Command replies, rendered once per local day (or minute) and reused
+responses = ScheduleResponses(SCHEDULE_TZ)
+
+# Coalescing and cooldowns for the read-only commands
+gate = CommandGate(COALESCE_WINDOW, USER_COOLDOWN, CHANNEL_COOLDOWN)
 
-def get_nation_war_schedule():
+# Calendar / JSON feeds served next to /health
+feed = ScheduleFeed(SCHEDULE_TZ)
+
+def get_nation_war_schedule(now=None):
     """
     Returns Nation War based on scheduled times (5 minutes before) in Lisbon time:
     Nation War: 1:55 AM, 4:55 AM, 7:55 AM, 10:55 AM, 1:55 PM, 4:55 PM, 7:55 PM, 10:55 PM (Lisbon time)
     """
-    # Get current time in Lisbon timezone
-    tz = pytz.timezone(TIMEZONE)
-    now = datetime.now(tz)
-    current_hour = now.hour
-    current_minute = now.minute
-
-    # Nation War times: 5 minutes before 2, 5, 8, 11, 14, 17, 20, 23 (Lisbon time)
-    # So at: 1:55, 4:55, 7:55, 10:55, 13:55, 16:55, 19:55, 22:55 (Lisbon time)
-    reminder_hours = [1, 4, 7, 10, 13, 16, 19, 22]
-    
-    if current_hour in reminder_hours and current_minute == 55:
-        # Calculate the actual event time (5 minutes later)
-        event_hour = (current_hour + 1) % 24
-        if event_hour in [2, 5, 8, 11, 14, 17, 20, 23]:
-            event_time = f"{event_hour:02d}:00"
-            # Convert to 12-hour format
-            if event_hour == 0:
-                formatted_time = "12:00 AM"
-            elif event_hour < 12:
-                formatted_time = f"{event_hour}:00 AM"
-            elif event_hour == 12:
-                formatted_time = "12:00 PM"
-            else:
-                formatted_time = f"{event_hour-12}:00 PM"
-            return "Nation War", formatted_time
-
-    return None, now.strftime("%I:%M %p")
-
-def get_world_boss_schedule():
+    return responses.nation_war_status(now)
+
+def get_world_boss_schedule(now=None):
     """
     Returns World Boss based on scheduled times in Lisbon time (2 minutes before events only):
     World Boss 2-min warnings: 12:58 AM, 1:08 AM, 5:58 AM, 6:08 AM, 10:58 AM, 11:08 AM, 
                                3:58 PM, 4:08 PM, 4:18 PM, 8:58 PM, 9:08 PM
     """
-    # Get current time in Lisbon timezone
-    tz = pytz.timezone(TIMEZONE)
-    now = datetime.now(tz)
-    current_hour = now.hour
-    current_minute = now.minute
-
-    # World Boss warning times (2 minutes before actual events only)
-    world_boss_warnings = {
-        0: [58],         # 12:58 AM for 1:00 AM event
-        1: [8],          # 1:08 AM for 1:10 AM event
-        5: [58],         # 5:58 AM for 6:00 AM event
-        6: [8],          # 6:08 AM for 6:10 AM event
-        10: [58],        # 10:58 AM for 11:00 AM event
-        11: [8],         # 11:08 AM for 11:10 AM event
-        15: [58],        # 3:58 PM for 4:00 PM event
-        16: [8, 18],     # 4:08 PM for 4:10 PM, 4:18 PM for 4:20 PM event
-        20: [58],        # 8:58 PM for 9:00 PM event
-        21: [8]          # 9:08 PM for 9:10 PM event
-    }
-    
-    if current_hour in world_boss_warnings and current_minute in world_boss_warnings[current_hour]:
-        # Calculate the actual event time (2 minutes later)
-        event_hour = current_hour
-        event_minute = (current_minute + 2) % 60
-        if current_minute == 58:
-            event_hour = (current_hour + 1) % 24
-            event_minute = 0
-        
-        # Convert to 12-hour format
-        if event_hour == 0:
-            formatted_time = f"12:{event_minute:02d} AM"
-        elif event_hour < 12:
-            formatted_time = f"{event_hour}:{event_minute:02d} AM"
-        elif event_hour == 12:
-            formatted_time = f"12:{event_minute:02d} PM"
-        else:
-            formatted_time = f"{event_hour-12}:{event_minute:02d} PM"
-        
-        return "World Boss", formatted_time, current_minute
-
-    return None, now.strftime("%I:%M %p"), None
-
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
-        self.send_header('Content-Length', '15')
-        self.end_headers()
-        self.wfile.write(b'Bot is running!')
-    
-    def do_HEAD(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
-        self.send_header('Content-Length', '15')
-        self.end_headers()
-    
-    def do_POST(self):
-        self.do_GET()
-    
-    def do_PUT(self):
-        self.do_GET()
-    
-    def do_DELETE(self):
-        self.do_GET()
-    
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.send_header('Allow', 'GET, HEAD, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Content-Length', '0')
-        self.end_headers()
-    
-    def log_message(self, format, *args):
-        # Suppress default logging to reduce noise
-        pass
+    return responses.world_boss_status(now)
 
-def run_health_server():
-    port = int(os.getenv('PORT', 8000))
+async def boot():
+    """Everything that runs once per process, before logging in to Discord"""
+    # Health/metrics server on the port claimed at startup, run on the bot's own loop
     try:
-        server = HTTPServer(('0.0.0.0', port), HealthCheckHandler)
-        print(f"Health server starting on port {port}")
-        server.serve_forever()
+        if health_socket is None:
+            raise health_error
+        bot.health_runner = await start_health_server(bot, health_socket, feed, reminders_state, GATEWAY_GRACE)
+        lifecycle.mark('health')
     except Exception as e:
-        print(f"Health server error: {e}")
+        log.error("Health server error: %s", e)
         # Continue without health server if it fails
+    watchdog.start()
+    journal.start()
+    # Reminders go out over REST, so the scheduler doesn't wait for the gateway
+    if LEASE_DB:
+        lifecycle.spawn(lease.run(start_reminders, stop_reminders))
+    else:
+        lifecycle.spawn(start_reminders())
+    if SCHEDULE_POLL > 0:
+        lifecycle.spawn(schedule_watcher.run())
+
+def reminders_state():
+    """'running', 'standby' (a replica holds the lease) or 'starting', reported by /health"""
+    if reminder_scheduler.running:
+        return 'running'
+    return 'standby' if lease is not None and not lease.leader else 'starting'
+
+async def start_reminders():
+    """Become this shard range's reminder scheduler"""
+    delivery_channels[:], unresolved = await local_channels(broadcaster, CHANNEL_IDS, SHARD_IDS, SHARD_COUNT)
+    countdown.channel_ids = delivery_channels
+    if unresolved:
+        resolving.add(lifecycle.spawn(resolve_later(broadcaster, unresolved, SHARD_IDS, SHARD_COUNT, delivery_channels)))
+    if LEASE_DB:
+        # A replica may have delivered reminders since we last read the shared journal
+        await journal.reload()
+    reminder_scheduler.start()
+    log.info("Scheduling reminders for %d channels (shards %s), %.2fs after start", len(delivery_channels), SHARDS,
+             lifecycle.mark('reminders'))
+
+async def stop_reminders():
+    reminder_scheduler.stop()
+    while resolving:
+        resolving.pop().cancel()
+
+async def sync_commands():
+    try:
+        synced = await bot.tree.sync()
+        log.info("Synced %d slash commands", len(synced))
+    except Exception as e:
+        log.error("❌ Slash command sync failed: %s", e)
+
+async def announce_online():
+    """Send the online message, at most once per ANNOUNCE_INTERVAL across restarts"""
+    if not ANNOUNCE_ONLINE or CHANNEL_ID not in delivery_channels or not reminder_scheduler.running:
+        return
+    key = f"online:{int(time.time() // ANNOUNCE_INTERVAL)}"
+    if key in journal:
+        return
+    result = await broadcaster.broadcast([CHANNEL_ID], "🤖 Bot is now online!")
+    if result.sent:
+        journal.record(key)
+        log.info("Successfully sent test message", extra={'channel': CHANNEL_ID})
+    else:
+        log.error("❌ Could not send online message to channel %s", CHANNEL_ID, extra={'channel': CHANNEL_ID})
+
+@bot.event
+async def setup_hook():
+    # Logged in: pause for global 429s together with discord.py's HTTP client
+    broadcaster.share_global_gate(bot.http._global_over)
+    # and register the slash versions of the commands with Discord
+    if SYNC_COMMANDS:
+        lifecycle.spawn(sync_commands())
 
 @bot.event
 async def on_ready():
-    print(f'Logged in as {bot.user}')
-    # Test if channel exists and bot can access it
-    channel = bot.get_channel(CHANNEL_ID)
-    if channel:
-        print(f'Found channel: {channel.name} in guild: {channel.guild.name}')
-        try:
-            await channel.send("🤖 Bot is now online!")
-
-            print("Successfully sent test message")
-        except discord.Forbidden:
-            print("❌ No permission to send messages in this channel")
-        except Exception as e:
-            print(f"❌ Error sending message: {e}")
-    else:
-        print(f"❌ Channel with ID {CHANNEL_ID} not found")
-    
-    hourly_message.start()
+    if lifecycle.ready():
+        log.info("Logged in as %s", bot.user)
+
+@bot.event
+async def on_resumed():
+    lifecycle.resumed()
+
+@bot.event
+async def on_disconnect():
+    lifecycle.disconnected()
 
-@bot.command(name='test')
+@bot.event
+async def on_socket_event_type(event_type):
+    metrics.GATEWAY_EVENTS.inc(type=event_type)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_latency(ctx):
+    metrics.COMMAND_LATENCY.observe(time.perf_counter() - ctx.started_at, command=ctx.command.name)
+    gate.release(ctx)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if not await gate.on_error(ctx, error):
+        await commands.Bot.on_command_error(bot, ctx, error)
+
+@bot.hybrid_command(name='test')
+@gate.hook()
 async def test_notification(ctx):
     """Test command to send a sample notification"""
     await ctx.send("⚔️ Nation War in 5min at 2:00 AM! ⚔️")
-    print("Test notification sent!")
+    log.info("Test notification sent!")
 
-@bot.command(name='testwb')
+@bot.hybrid_command(name='testwb')
+@gate.hook()
 async def test_world_boss(ctx):
     """Test command to send a sample World Boss notification"""
     await ctx.send("🐲 World Boss NOW at 4:00 PM Lisbon / 11:00 PM Manila! 🐲")
-    print("Test World Boss notification sent!")
+    log.info("Test World Boss notification sent!")
 
-@bot.command(name='schedule')
+@bot.hybrid_command(name='schedule')
+@gate.hook()
 async def check_schedule(ctx):
     """Check the current schedule status"""
-    tz = pytz.timezone(TIMEZONE)
-    manila_tz = pytz.timezone('Asia/Manila')
-    current_time = datetime.now(tz).strftime("%I:%M %p")
-    manila_time = datetime.now(manila_tz).strftime("%I:%M %p")
-    
-    # Check Nation War
-    nation_war_event, nation_war_time = get_nation_war_schedule()
-    
-    # Check World Boss
-    world_boss_event, world_boss_time, _ = get_world_boss_schedule()
-    
-    if nation_war_event or world_boss_event:
-        schedule_text = "📅 Upcoming Events:\n"
-        if nation_war_event:
-            schedule_text += f"⚔️ {nation_war_event} at {nation_war_time} (Lisbon time)\n"
-        if world_boss_event:
-            schedule_text += f"🐲 {world_boss_event} at {world_boss_time} (Lisbon time)\n"
-        await ctx.send(schedule_text)
-    else:
-        await ctx.send(f"📅 No events scheduled right now.\n"
-                      f"Current time (Lisbon): {current_time}\n"
-                      f"Current time (Manila): {manila_time}")
-    
-    # Show Nation War reminder times
-    reminder_times = ["1:55 AM", "4:55 AM", "7:55 AM", "10:55 AM", "1:55 PM", "4:55 PM", "7:55 PM", "10:55 PM"]
-    await ctx.send(f"⚔️ Nation War reminders (Lisbon time): {', '.join(reminder_times)}")
-    
-    # Show World Boss warning times
-    #world_boss_times = ["12:58 AM → 1:00 AM", "1:08 AM → 1:10 AM", "5:58 AM → 6:00 AM", "6:08 AM → 6:10 AM", "10:58 AM → 11:00 AM", "11:08 AM → 11:10 AM", "3:58 PM → 4:00 PM", "4:08 PM → 4:10 PM", "4:18 PM → 4:20 PM", "8:58 PM → 9:00 PM", "9:08 PM → 9:10 PM"]
-    #await ctx.send(f"🐲 World Boss 2-min warnings (Lisbon time): {', '.join(world_boss_times)}")
-
-@bot.command(name='times')
+    with cpu_timer('schedule'):
+        reply = '\n\n'.join(responses.schedule())
+    await ctx.send(reply)
+
+@bot.hybrid_command(name='times')
+@gate.hook()
 async def show_all_times(ctx):
     """Show all event times in Lisbon and Manila time"""
-    lisbon_tz = pytz.timezone('Europe/Lisbon')
-    manila_tz = pytz.timezone('Asia/Manila')
-    
-    schedule_text = "🌍 Complete Event Schedule:\n\n"
-    
-    # Nation War Schedule
-    schedule_text += "⚔️ Nation War Events:\n"
-    nation_war_hours = [2, 5, 8, 11, 14, 17, 20, 23]
-    
-    for hour in nation_war_hours:
-        lisbon_time = datetime.now(lisbon_tz).replace(hour=hour, minute=0, second=0, microsecond=0)
-        manila_time = lisbon_time.astimezone(manila_tz)
-        
-        lisbon_12h = lisbon_time.strftime("%I:%M %p").lstrip('0')
-        manila_12h = manila_time.strftime("%I:%M %p").lstrip('0')
-        
-        schedule_text += f"Lisbon: {lisbon_12h} → Manila: {manila_12h}\n"
-    
-    # World Boss Schedule
-    schedule_text += "\n🐲 World Boss Events:\n"
-    world_boss_times = [
-        (1, [0, 10]),      # 1:00 AM & 1:10 AM
-        (6, [0, 10]),      # 6:00 AM & 6:10 AM  
-        (11, [0, 10]),     # 11:00 AM & 11:10 AM
-        (16, [0, 10, 20]), # 4:00 PM & 4:10 PM & 4:20 PM
-        (21, [0, 10])      # 9:00 PM & 9:10 PM
-    ]
-    
-    for hour, minutes in world_boss_times:
-        for minute in minutes:
-            lisbon_time = datetime.now(lisbon_tz).replace(hour=hour, minute=minute, second=0, microsecond=0)
-            manila_time = lisbon_time.astimezone(manila_tz)
-            
-            lisbon_12h = lisbon_time.strftime("%I:%M %p").lstrip('0')
-            manila_12h = manila_time.strftime("%I:%M %p").lstrip('0')
-            
-            schedule_text += f"Lisbon: {lisbon_12h} → Manila: {manila_12h}\n"
-    
-    await ctx.send(schedule_text)
-
-@bot.command(name='worldboss')
+    with cpu_timer('times'):
+        reply = responses.times()
+    await ctx.send(reply)
+
+@bot.hybrid_command(name='worldboss')
+@gate.hook()
 async def show_world_boss_times(ctx):
     """Show World Boss event times in Lisbon and Manila time"""
-    lisbon_tz = pytz.timezone('Europe/Lisbon')
-    manila_tz = pytz.timezone('Asia/Manila')
-    
-    schedule_text = "🐲 World Boss Schedule:\n\n"
-    
-    world_boss_times = [
-        (1, [0, 10]),      # 1:00 AM & 1:10 AM
-        (6, [0, 10]),      # 6:00 AM & 6:10 AM  
-        (11, [0, 10]),     # 11:00 AM & 11:10 AM
-        (16, [0, 10, 20]), # 4:00 PM & 4:10 PM & 4:20 PM
-        (21, [0, 10])      # 9:00 PM & 9:10 PM
-    ]
-    
-    for hour, minutes in world_boss_times:
-        time_list = []
-        manila_time_list = []
-        
-        for minute in minutes:
-            lisbon_time = datetime.now(lisbon_tz).replace(hour=hour, minute=minute, second=0, microsecond=0)
-            manila_time = lisbon_time.astimezone(manila_tz)
-            
-            lisbon_12h = lisbon_time.strftime("%I:%M %p").lstrip('0')
-            manila_12h = manila_time.strftime("%I:%M %p").lstrip('0')
-            
-            time_list.append(lisbon_12h)
-            manila_time_list.append(manila_12h)
-        
-        schedule_text += f"Lisbon: {' & '.join(time_list)} → Manila: {' & '.join(manila_time_list)}\n"
-    
-    await ctx.send(schedule_text)
-
-@bot.command(name='debug')
+    with cpu_timer('worldboss'):
+        reply = responses.worldboss()
+    await ctx.send(reply)
+
+@bot.hybrid_command(name='debug')
+@gate.hook()
 async def debug_time(ctx):
     """Debug current time and schedule logic"""
-    # Get Lisbon, UTC, and Manila time for comparison
-    lisbon_tz = pytz.timezone('Europe/Lisbon')
-    lisbon_now = datetime.now(lisbon_tz)
-    utc_now = datetime.now(pytz.UTC)
-    manila_tz = pytz.timezone('Asia/Manila')
-    manila_now = datetime.now(manila_tz)
-    
-    current_hour = lisbon_now.hour
-    current_minute = lisbon_now.minute
-    
-    await ctx.send(f"🐛 Debug Info:\n"
-                  f"Current time (Lisbon): {lisbon_now.strftime('%H:%M')} (24h) / {lisbon_now.strftime('%I:%M %p')} (12h)\n"
-                  f"Current time (Manila): {manila_now.strftime('%H:%M')} (24h) / {manila_now.strftime('%I:%M %p')} (12h)\n"
-                  f"UTC time: {utc_now.strftime('%H:%M')} (24h) / {utc_now.strftime('%I:%M %p')} (12h)\n"
-                  f"Hour: {current_hour}, Minute: {current_minute}\n"
-                  f"Nation War reminder hour: {current_hour in [1, 4, 7, 10, 13, 16, 19, 22]}\n"
-                  f"Is minute 55/59: {current_minute in [55, 59]}\n"
-                  f"World Boss warning hour: {current_hour in [0, 1, 5, 6, 10, 11, 15, 16, 20, 21]}\n"
-                  f"Is minute 58/08/18: {current_minute in [58, 8, 18]}")
-    
-    # Check for upcoming events
-    events_info = ""
-    
-    # Test Nation War
-    if current_hour in [1, 4, 7, 10, 13, 16, 19, 22]:
-        event_hour = (current_hour + 1) % 24
-        if event_hour in [2, 5, 8, 11, 14, 17, 20, 23]:
-            if event_hour == 0:
-                formatted_time = "12:00 AM"
-            elif event_hour < 12:
-                formatted_time = f"{event_hour}:00 AM"
-            elif event_hour == 12:
-                formatted_time = "12:00 PM"
-            else:
-                formatted_time = f"{event_hour-12}:00 PM"
-            
-            lisbon_event = lisbon_now.replace(hour=event_hour, minute=0, second=0, microsecond=0)
-            manila_event = lisbon_event.astimezone(manila_tz)
-            manila_formatted = manila_event.strftime("%I:%M %p").lstrip('0')
-            
-            events_info += f"⚔️ Next Nation War:\nLisbon: {formatted_time}\nManila: {manila_formatted}\n\n"
-    
-    # Test World Boss
-    world_boss_warnings = {
-        0: [58],         # 12:58 AM for 1:00 AM event
-        1: [8],          # 1:08 AM for 1:10 AM event
-        5: [58],         # 5:58 AM for 6:00 AM event
-        6: [8],          # 6:08 AM for 6:10 AM event
-        10: [58],        # 10:58 AM for 11:00 AM event
-        11: [8],         # 11:08 AM for 11:10 AM event
-        15: [58],        # 3:58 PM for 4:00 PM event
-        16: [8, 18],     # 4:08 PM for 4:10 PM, 4:18 PM for 4:20 PM event
-        20: [58],        # 8:58 PM for 9:00 PM event
-        21: [8]          # 9:08 PM for 9:10 PM event
-    }
-    
-    if current_hour in world_boss_warnings:
-        upcoming_minutes = [m for m in world_boss_warnings[current_hour] if m >= current_minute]
-        if upcoming_minutes:
-            next_minute = upcoming_minutes[0]
-            # Calculate the actual event time (2 minutes after warning)
-            event_hour = current_hour
-            event_minute = (next_minute + 2) % 60
-            if next_minute == 58:
-                event_hour = (current_hour + 1) % 24
-                event_minute = 0
-            
-            if event_hour == 0:
-                formatted_time = f"12:{event_minute:02d} AM"
-            elif event_hour < 12:
-                formatted_time = f"{event_hour}:{event_minute:02d} AM"
-            elif event_hour == 12:
-                formatted_time = f"12:{event_minute:02d} PM"
-            else:
-                formatted_time = f"{event_hour-12}:{event_minute:02d} PM"
-            
-            lisbon_event = lisbon_now.replace(hour=event_hour, minute=event_minute, second=0, microsecond=0)
-            manila_event = lisbon_event.astimezone(manila_tz)
-            manila_formatted = manila_event.strftime("%I:%M %p").lstrip('0')
-            
-            events_info += f"🐲 Next World Boss:\nLisbon: {formatted_time}\nManila: {manila_formatted}"
-    
-    if events_info:
-        await ctx.send(events_info)
-    else:
-        await ctx.send("No immediate events scheduled.")
-
-@tasks.loop(minutes=1)
-async def hourly_message():
-    # Check for both Nation War and World Boss events
-    tz = pytz.timezone(TIMEZONE)  # Europe/Lisbon
-    now = datetime.now(tz)
-    current_hour = now.hour
-    current_minute = now.minute
-    
-    channel = bot.get_channel(CHANNEL_ID)
-    if not channel:
-        print(f"❌ Channel {CHANNEL_ID} not found")
+    with cpu_timer('debug'):
+        reply = '\n\n'.join(responses.debug())
+    await ctx.send(reply)
+
+def event_names():
+    """
+    Short names accepted by !subscribe, e.g. {'nationwar': 'Cabal/Nation War'};
+    an event name several games share is prefixed with the game ('cabalnationwar')
+    """
+    game_events = schedule_watcher.index.game_events()
+    shared = Counter(event for _, event in game_events)
+    return {(game + event if shared[event] > 1 else event).lower().replace(' ', ''): event_key(game, event)
+            for game, event in game_events}
+
+@bot.hybrid_command(name='subscribe')
+@app_commands.describe(tz_name="Your timezone, e.g. Asia/Manila",
+                       events="nationwar, worldboss or all (comma-separated)",
+                       delivery="dm, mention (you, here) or role (a role, here)",
+                       role="The role to mention, for role delivery")
+async def subscribe(ctx, tz_name: str, events: str = 'all', delivery: str = 'dm', role: discord.Role = None):
+    """Get reminders in your own timezone, e.g. !subscribe Asia/Manila nationwar,worldboss dm (or role @Raiders)"""
+    known = event_names()
+    names = [e.strip().lower() for e in events.split(',') if e.strip()]
+    if 'all' in names:
+        names = []
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        await ctx.send(f"❌ Unknown event(s): {', '.join(unknown)}. Use {', '.join(known)} or all")
+        return
+    # Same rule as Discord's: only mentionable roles, unless you may mention @everyone here
+    if role is not None and not (role.mentionable or ctx.channel.permissions_for(ctx.author).mention_everyone):
+        await ctx.send(f"❌ You can't mention {role.name} in this channel")
         return
-    
-    manila_tz = pytz.timezone('Asia/Manila')
-    
     try:
-        # Check for Nation War (at :55 and :59 minutes)
-        if current_minute in [55, 59]:
-            reminder_hours = [1, 4, 7, 10, 13, 16, 19, 22]
-            if current_hour in reminder_hours:
-                event_hour = (current_hour + 1) % 24
-                if event_hour in [2, 5, 8, 11, 14, 17, 20, 23]:
-                    # Convert to 12-hour format
-                    if event_hour == 0:
-                        formatted_time = "12:00 AM"
-                    elif event_hour < 12:
-                        formatted_time = f"{event_hour}:00 AM"
-                    elif event_hour == 12:
-                        formatted_time = "12:00 PM"
-                    else:
-                        formatted_time = f"{event_hour-12}:00 PM"
-                    
-                    # Calculate Manila time for the event
-                    lisbon_event = now.replace(hour=event_hour, minute=0, second=0, microsecond=0)
-                    manila_event = lisbon_event.astimezone(manila_tz)
-                    manila_formatted = manila_event.strftime("%I:%M %p").lstrip('0')
-                    
-                    # Different messages for 5-min and 1-min warnings
-                    if current_minute == 55:
-                        message = f"⚔️ Nation War in 5min at {formatted_time} Lisbon / {manila_formatted} Manila! ⚔️"
-                        log_msg = f"✅ Sent 5-minute Nation War reminder for {formatted_time} Lisbon / {manila_formatted} Manila"
-                    else:  # current_minute == 59
-                        message = f"⚔️ Nation War in 1min at {formatted_time} Lisbon / {manila_formatted} Manila! Ready! ⚔️"
-                        log_msg = f"✅ Sent 1-minute Nation War reminder for {formatted_time} Lisbon / {manila_formatted} Manila"
-                    
-                    await channel.send(message)
-                    current_time = now.strftime("%H:%M")
-                    utc_now = datetime.now(pytz.UTC)
-                    print(f"[{current_time} Lisbon / {utc_now.strftime('%H:%M')} UTC] {log_msg}")
-        
-        # Check for World Boss events (2 minutes before: at :58, :08, :18 minutes)
-        if current_minute in [58, 8, 18]:
-            world_boss_schedule = {
-                0: [58],         # 12:58 AM for 1:00 AM event
-                1: [8],          # 1:08 AM for 1:10 AM event
-                5: [58],         # 5:58 AM for 6:00 AM event
-                6: [8],          # 6:08 AM for 6:10 AM event
-                10: [58],        # 10:58 AM for 11:00 AM event
-                11: [8],         # 11:08 AM for 11:10 AM event
-                15: [58],        # 3:58 PM for 4:00 PM event
-                16: [8, 18],     # 4:08 PM for 4:10 PM, 4:18 PM for 4:20 PM event
-                20: [58],        # 8:58 PM for 9:00 PM event
-                21: [8]          # 9:08 PM for 9:10 PM event
-            }
-            
-            if current_hour in world_boss_schedule and current_minute in world_boss_schedule[current_hour]:
-                # Calculate the actual event time (2 minutes later)
-                event_hour = current_hour
-                event_minute = (current_minute + 2) % 60
-                if current_minute == 58:
-                    event_hour = (current_hour + 1) % 24
-                    event_minute = 0
-                
-                # Convert to 12-hour format
-                if event_hour == 0:
-                    formatted_time = f"12:{event_minute:02d} AM"
-                elif event_hour < 12:
-                    formatted_time = f"{event_hour}:{event_minute:02d} AM"
-                elif event_hour == 12:
-                    formatted_time = f"12:{event_minute:02d} PM"
-                else:
-                    formatted_time = f"{event_hour-12}:{event_minute:02d} PM"
-                
-                # Calculate Manila time for the event
-                lisbon_event = now.replace(hour=event_hour, minute=event_minute, second=0, microsecond=0)
-                manila_event = lisbon_event.astimezone(manila_tz)
-                manila_formatted = manila_event.strftime("%I:%M %p").lstrip('0')
-                
-                # Send 2-minute warning
-                message = f"🐲 World Boss in 2min at {formatted_time} Lisbon / {manila_formatted} Manila! 🐲"
-                log_msg = f"✅ Sent 2-minute World Boss reminder for {formatted_time} Lisbon / {manila_formatted} Manila"
-                
-                await channel.send(message)
-                current_time = now.strftime("%H:%M")
-                utc_now = datetime.now(pytz.UTC)
-                print(f"[{current_time} Lisbon / {utc_now.strftime('%H:%M')} UTC] {log_msg}")
-                
-    except discord.Forbidden:
-        print("❌ No permission to send messages")
-    except Exception as e:
-        print(f"❌ Error: {e}")
+        subscriptions.subscribe(ctx.author.id, tz_name, [known[name] for name in names],
+                                delivery.lower(), ctx.channel.id, role.id if role is not None else None)
+    except (ValueError, KeyError):
+        await ctx.send("❌ Use a timezone like Europe/Lisbon or Asia/Manila, and delivery dm, mention or role @Role")
+        return
+    followed = ', '.join(known[name] for name in names) or 'all events'
+    by = f"mentioning {role.name}" if role is not None else delivery.lower()
+    await ctx.send(f"✅ {ctx.author.mention} you'll get {followed} reminders in {tz_name} time by {by}")
+
+@bot.hybrid_command(name='unsubscribe')
+async def unsubscribe(ctx):
+    """Stop personal reminders"""
+    if subscriptions.unsubscribe(ctx.author.id):
+        await ctx.send(f"✅ {ctx.author.mention} unsubscribed")
+    else:
+        await ctx.send(f"{ctx.author.mention} you have no subscription")
+
+async def send_reminder(reminder, event_utc):
+    """
+    Broadcast one Nation War / World Boss reminder to every notification channel
+    and subscriber. Each channel and subscriber is journaled as soon as it has
+    the message, so a retry or a restart mid-fan-out only reaches the ones
+    still missing it.
+    """
+    fired_at = (event_utc - timedelta(minutes=reminder.lead)).timestamp()
+    key = reminder_id(reminder, event_utc)
+    # Rate-limited channels keep retrying until the event's next warning (or its start) takes over
+    deadline = reminder_scheduler.deadline(reminder, event_utc).timestamp()
+    channels = [channel_id for channel_id in delivery_channels if delivery_id(key, channel_id) not in journal]
+    if COUNTDOWN:
+        sends = [countdown.update(reminder, event_utc, fired_at=fired_at, channel_ids=channels, deadline=deadline)]
+    else:
+        sends = [broadcaster.broadcast(channels, reminder_message(reminder, event_utc), fired_at=fired_at,
+                                       deadline=deadline)]
+    if OWNS_DMS:
+        sends.append(personal.deliver(reminder, event_utc, fired_at=fired_at, deadline=deadline,
+                                      skip=lambda user_id: delivery_id(key, f"user:{user_id}") in journal))
+    result, *personal_results = await asyncio.gather(*sends)
+    for channel_id in result.delivered:
+        journal.record(delivery_id(key, channel_id))
+    for personal_result in personal_results:
+        for user_id in personal_result.delivered:
+            journal.record(delivery_id(key, f"user:{user_id}"))
+    personal_sent = sum(personal_result.sent for personal_result in personal_results)
+    manila_formatted = event_utc.astimezone(MANILA_TZ).strftime("%I:%M %p").lstrip('0')
+    log.info("✅ Sent %d-minute %s reminder for %s Lisbon / %s Manila",
+             reminder.lead, reminder.event, format_12h(reminder.hour, reminder.minute), manila_formatted,
+             extra={'event_id': key,
+                    'fire_time': datetime.fromtimestamp(fired_at, timezone.utc).isoformat(),
+                    'latency': round(result.latency, 3), 'channels': len(channels), 'sent': result.sent,
+                    'personal': personal_sent, 'rate_limited': result.rate_limited})
+    # Some channel or subscriber failed in a way worth retrying: the scheduler tries again while it's useful
+    return not result.retry and not any(personal_result.retry for personal_result in personal_results)
+
+# Fans reminders out to all channels concurrently, backing off per rate-limit bucket
+rest = RestTransport(TOKEN, DISCORD_API)
+broadcaster = Broadcaster(rest)
+
+# Live countdowns edited in place (COUNTDOWN mode)
+countdown = CountdownDelivery(broadcaster, CHANNEL_IDS)
+
+# Notification channels on this process's shards (all of them when unsharded),
+# and the background retries of channel lookups that failed
+delivery_channels = list(CHANNEL_IDS)
+resolving = set()
+
+# Personal reminders by DM / mention, in each subscriber's own timezone
+subscriptions = SubscriptionStore(SUBSCRIPTIONS_DB)
+personal = PersonalDelivery(subscriptions, broadcaster)
+
+# Reminders already delivered, so restarts neither repeat nor drop them
+journal = DeliveryJournal(JOURNAL_PATH if SHARDS == 'all' else f"{JOURNAL_PATH}.{SHARDS}",
+                          compact=not LEASE_DB)
+
+# Leader election among replicas of the same shard range (LEASE_DB only)
+lease = LeaderLease(LEASE_DB, f"reminders:{SHARDS}") if LEASE_DB else None
+
+# Sleeps until the next reminder instead of polling every minute
+reminder_scheduler = ReminderScheduler(INDEX, SCHEDULE_TZ, send_reminder, journal=journal)
+
+# Picks up edits to the schedules file without a restart
+schedule_watcher = ScheduleWatcher(SCHEDULE_FILE, INDEX, [reminder_scheduler, responses, feed], interval=SCHEDULE_POLL)
+
+# Loop lag sampling and stall stacks (STALL_THRESHOLD seconds)
+watchdog = LoopWatchdog(threshold=float(os.getenv('STALL_THRESHOLD', 0.1)))
+
+# First boot vs. reconnect handling
+lifecycle = Lifecycle(boot, on_first_ready=announce_online, started=STARTED)
+
+async def main():
+    async with bot:
+        # Health port and reminders first: neither needs the login or the gateway
+        await lifecycle.boot()
+        await bot.start(TOKEN)
 
 if TOKEN:
-    # Start health check server in background thread
-    try:
-        health_thread = threading.Thread(target=run_health_server, daemon=True)
-        health_thread.start()
-        print("Health check server started")
-    except Exception as e:
-        print(f"Failed to start health server: {e}")
-    
     # Start the Discord bot
     try:
-        bot.run(TOKEN)
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
-        print(f"Bot error: {e}")
+        log.exception("Bot error: %s", e)
+    finally:
+        if lease is not None:
+            lease.release()
+        journal.close()
+        subscriptions.close()
+        log_listener.stop()
 else:
-    print("Error: DISCORD_BOT_TOKEN not found in .env file")
\ No newline at end of file
+    log.error("Error: DISCORD_BOT_TOKEN not found in .env file")
+    if health_socket is not None:
+        health_socket.close()
+    log_listener.stop()
\ No newline at end of file
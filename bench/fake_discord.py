@@ -0,0 +1,433 @@
+"""
+A local stand-in for Discord's REST API and gateway, for load tests.
+
+    python -m bench.fake_discord [--port 8765] [--guilds 1000] [--channels-per-guild 2]
+
+Point the bot at it with DISCORD_API=http://127.0.0.1:<port>/api/v10: the
+REST routes the bot uses answer from memory, and /gateway/bot hands out a
+websocket that speaks enough of the gateway protocol (HELLO, IDENTIFY ->
+READY + GUILD_CREATE per guild, heartbeats, RESUME, RECONNECT) for discord.py
+to log in, cache thousands of guilds and run prefix commands.
+
+Everything that matters for a load test is injectable: per-request latency,
+Discord's per-channel message buckets and global limit, random 429s,
+channels the bot may not post in, MESSAGE_CREATE command spam and gateway
+reconnects. Every message posted is recorded with its arrival time and
+whether it came from the reminder transport or from discord.py (command
+replies), so the runner can compute delivery latency from the outside.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timezone
+
+from aiohttp import WSMsgType, web
+
+DISCORD_EPOCH = 1420070400000
+BOT_ID = 1000
+APPLICATION_ID = 1001
+REMINDER_AGENT = 'discord-bot reminders'  # User-Agent of broadcast.RestTransport
+
+# Discord's defaults: 5 messages per 5 s per channel, 50 requests per second per bot
+CHANNEL_BUCKET = 5
+CHANNEL_RESET = 5.0
+GLOBAL_LIMIT = 50
+HEARTBEAT_ACK_DELAY = 0.05
+GUILD_MESSAGES = 1 << 9  # intent without which a session gets no guild MESSAGE_CREATE
+
+# One message that reached a channel: who sent it (reminder transport or discord.py) and when
+Posted = namedtuple('Posted', ['at', 'channel_id', 'content', 'reminder'])
+
+
+def snowflake(ms, sequence=0):
+    return ((ms - DISCORD_EPOCH) << 22) | sequence
+
+
+def _json(data, status=200, headers=None):
+    # discord.py only parses bodies whose Content-Type is exactly application/json (no charset)
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={**(headers or {}), 'Content-Type': 'application/json'})
+
+
+def _iso(moment=None):
+    return (moment or datetime.now(timezone.utc)).isoformat()
+
+
+class _Session:
+    """One gateway connection"""
+
+    def __init__(self, ws, session_id):
+        self.ws = ws
+        self.session_id = session_id
+        self.shard = (0, 1)
+        self.intents = 0
+        self.sequence = 0
+
+    async def dispatch(self, event, data):
+        self.sequence += 1
+        await self.ws.send_str(json.dumps({'op': 0, 't': event, 's': self.sequence, 'd': data}))
+
+
+class FakeDiscord:
+    def __init__(self, guilds=100, channels_per_guild=2, latency=0.0, rate_limit_rate=0.0, retry_after=0.5,
+                 forbidden=0.0, channel_bucket=CHANNEL_BUCKET, channel_reset=CHANNEL_RESET,
+                 global_limit=GLOBAL_LIMIT, seed=0):
+        """
+        latency: seconds added to every REST response
+        rate_limit_rate: fraction of message posts answered with a spurious 429 (retry_after seconds)
+        forbidden: fraction of guild channels that answer 403 Missing Access
+        channel_bucket / channel_reset: per-channel message bucket (0 disables)
+        global_limit: requests per second before a global 429 (0 disables)
+        """
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.channel_bucket = channel_bucket
+        self.channel_reset = channel_reset
+        self.global_limit = global_limit
+        self._random = random.Random(seed)
+        base = int(time.time() * 1000) - 10**9
+        # Guild ids spread over the shards like real snowflakes; channel ids carry their guild in the high bits
+        self.guilds = [snowflake(base + index * 7919) for index in range(guilds)]
+        self.channels = {}  # channel id -> guild id (None for DMs)
+        self._guild_channels = {guild_id: [guild_id | offset for offset in range(1, channels_per_guild + 1)]
+                                for guild_id in self.guilds}
+        for guild_id, channel_ids in self._guild_channels.items():
+            self.channels.update(dict.fromkeys(channel_ids, guild_id))
+        self.forbidden = set(self._random.sample(sorted(self.channels), int(len(self.channels) * forbidden)))
+        self.unmanaged = set()  # channels where the bot lacks Manage Messages: bulk-delete answers 403
+        self._dm_channels = {}  # user id -> channel id
+        self._ids = 0
+        self._buckets = {}         # channel id -> [window start, used]
+        self._global = deque()     # request times in the last second
+        self._sessions = {}        # session id -> _Session
+        self._pending = {}         # channel id -> dispatch times of unanswered commands
+        self._reconnects = {}      # session id -> time the reconnect was forced
+        self._tasks = set()
+        self.url = None
+        self._runner = None
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self.posted = []
+        self.requests = Counter()      # (method, route, status)
+        self.rate_limited = Counter()  # scope -> 429s served
+        self.commands_sent = 0
+        self.reply_latency = []
+        self.resume_latency = []
+        self.identifies = 0
+        self._pending.clear()
+        self._reconnects.clear()
+
+    def guild_channels(self):
+        """Channel ids the bot may post in"""
+        return [channel_id for channel_id in self.channels if channel_id not in self.forbidden]
+
+    def _next_id(self):
+        self._ids += 1
+        return snowflake(int(time.time() * 1000), self._ids % (1 << 22))
+
+    # -- REST --------------------------------------------------------------
+
+    def _user(self, user_id, bot=False):
+        return {'id': str(user_id), 'username': 'loadbot' if bot else f'user{user_id}', 'discriminator': '0',
+                'global_name': None, 'avatar': None, 'bot': bot}
+
+    def _message(self, channel_id, content, author=None):
+        guild_id = self.channels.get(channel_id)
+        message = {'id': str(self._next_id()), 'channel_id': str(channel_id),
+                   'author': author or self._user(BOT_ID, bot=True), 'content': content, 'timestamp': _iso(),
+                   'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+                   'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0}
+        if guild_id:
+            message['guild_id'] = str(guild_id)
+        return message
+
+    def _channel(self, channel_id):
+        guild_id = self.channels[channel_id]
+        if guild_id is None:
+            return {'id': str(channel_id), 'type': 1, 'recipients': []}
+        return {'id': str(channel_id), 'type': 0, 'guild_id': str(guild_id), 'name': f'reminders-{channel_id & 0xff}',
+                'position': channel_id & 0xff, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None}
+
+    def _too_many(self, retry_after, scope, is_global=False):
+        self.rate_limited[scope] += 1
+        return _json({'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': is_global},
+                     status=429, headers={'Retry-After': str(retry_after), 'X-RateLimit-Scope': scope,
+                                          **({'X-RateLimit-Global': 'true'} if is_global else {})})
+
+    @web.middleware
+    async def _rest(self, request, handler):
+        """Latency, the global limit and request accounting around every REST route"""
+        if request.path == '/gateway':
+            return await handler(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        route = (request.method, getattr(request.match_info.route.resource, 'canonical', request.path))
+        now = time.monotonic()
+        if self.global_limit:
+            while self._global and now - self._global[0] >= 1.0:
+                self._global.popleft()
+            if len(self._global) >= self.global_limit:
+                response = self._too_many(round(1.0 - (now - self._global[0]), 3), 'global', is_global=True)
+                self.requests[route + (429,)] += 1
+                return response
+            self._global.append(now)
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            self.requests[route + (e.status,)] += 1
+            raise
+        self.requests[route + (response.status,)] += 1
+        return response
+
+    async def _get_user(self, request):
+        return _json(self._user(BOT_ID, bot=True))
+
+    async def _get_application(self, request):
+        return _json({'id': str(APPLICATION_ID), 'name': 'loadbot', 'description': '', 'icon': None,
+                      'bot_public': False, 'bot_require_code_grant': False, 'verify_key': '',
+                      'owner': self._user(1, bot=False), 'flags': 0})
+
+    async def _get_gateway(self, request):
+        return _json({'url': self.url.replace('http', 'ws', 1) + '/gateway', 'shards': 1,
+                      'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0,
+                                              'max_concurrency': 1}})
+
+    def _channel_id(self, request):
+        channel_id = int(request.match_info['channel_id'])
+        if channel_id not in self.channels:
+            raise web.HTTPNotFound(text=json.dumps({'message': 'Unknown Channel', 'code': 10003}))
+        if channel_id in self.forbidden:
+            raise web.HTTPForbidden(text=json.dumps({'message': 'Missing Access', 'code': 50001}))
+        return channel_id
+
+    async def _get_channel(self, request):
+        return _json(self._channel(self._channel_id(request)))
+
+    async def _post_message(self, request):
+        channel_id = self._channel_id(request)
+        headers = {}
+        if self.channel_bucket:
+            now = time.monotonic()
+            bucket = self._buckets.get(channel_id)
+            if bucket is None or now - bucket[0] >= self.channel_reset:
+                bucket = self._buckets[channel_id] = [now, 0]
+            reset_after = round(self.channel_reset - (now - bucket[0]), 3)
+            if bucket[1] >= self.channel_bucket:
+                return self._too_many(reset_after, 'user')
+            bucket[1] += 1
+            headers = {'X-RateLimit-Limit': str(self.channel_bucket),
+                       'X-RateLimit-Remaining': str(self.channel_bucket - bucket[1]),
+                       'X-RateLimit-Reset-After': str(reset_after), 'X-RateLimit-Bucket': f'messages:{channel_id}'}
+        if self.rate_limit_rate and self._random.random() < self.rate_limit_rate:
+            return self._too_many(self.retry_after, 'shared')
+        content = (await request.json()).get('content', '')
+        now = time.time()
+        reminder = REMINDER_AGENT in request.headers.get('User-Agent', '')
+        self.posted.append(Posted(now, channel_id, content, reminder))
+        if not reminder:
+            for dispatched in self._pending.pop(channel_id, ()):
+                self.reply_latency.append(now - dispatched)
+        return _json(self._message(channel_id, content), headers=headers)
+
+    async def _edit_message(self, request):
+        channel_id = self._channel_id(request)
+        content = (await request.json()).get('content', '')
+        return _json(self._message(channel_id, content))
+
+    async def _delete_message(self, request):
+        self._channel_id(request)
+        return web.Response(status=204)
+
+    async def _bulk_delete(self, request):
+        if self._channel_id(request) in self.unmanaged:
+            raise web.HTTPForbidden(text=json.dumps({'message': 'Missing Permissions', 'code': 50013}))
+        if not 2 <= len((await request.json()).get('messages', ())) <= 100:
+            raise web.HTTPBadRequest(text='{"message": "Invalid Form Body"}')
+        return web.Response(status=204)
+
+    async def _open_dm(self, request):
+        user_id = int((await request.json())['recipient_id'])
+        channel_id = self._dm_channels.get(user_id)
+        if channel_id is None:
+            channel_id = self._dm_channels[user_id] = self._next_id()
+            self.channels[channel_id] = None
+        return _json({'id': str(channel_id), 'type': 1, 'recipients': [self._user(user_id)]})
+
+    async def _sync_commands(self, request):
+        return _json([{'default_member_permissions': None, **command, 'id': str(self._next_id()),
+                       'application_id': str(APPLICATION_ID), 'version': '1'}
+                      for command in await request.json()])
+
+    # -- gateway -----------------------------------------------------------
+
+    def _guild(self, guild_id):
+        return {'id': str(guild_id), 'name': f'guild-{guild_id >> 22}', 'icon': None, 'owner_id': '1',
+                'unavailable': False, 'member_count': 2, 'large': False, 'features': [], 'emojis': [],
+                'stickers': [], 'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '68672',
+                                           'position': 0, 'color': 0, 'hoist': False, 'managed': False,
+                                           'mentionable': False}],
+                'channels': [self._channel(channel_id) for channel_id in self._guild_channels[guild_id]],
+                'members': [], 'voice_states': [], 'presences': [], 'threads': [], 'stage_instances': [],
+                'guild_scheduled_events': [], 'joined_at': _iso(), 'premium_tier': 0, 'preferred_locale': 'en-US',
+                'verification_level': 0, 'default_message_notifications': 0, 'explicit_content_filter': 0,
+                'mfa_level': 0, 'nsfw_level': 0, 'system_channel_flags': 0}
+
+    async def _ack(self, ws):
+        await asyncio.sleep(HEARTBEAT_ACK_DELAY)
+        if not ws.closed:
+            await ws.send_str(json.dumps({'op': 11}))
+
+    def _guilds_on(self, shard):
+        shard_id, shard_count = shard
+        return [guild_id for guild_id in self.guilds if (guild_id >> 22) % shard_count == shard_id]
+
+    async def _gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        session = None
+        await ws.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}}))
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            op, data = payload.get('op'), payload.get('d')
+            if op == 1:
+                # Ack after a round trip: an instant ack reaches discord.py before its keep-alive
+                # thread records the send, and it then logs a bogus "Can't keep up" warning
+                task = asyncio.create_task(self._ack(ws))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            elif op == 2:
+                self.identifies += 1
+                session = _Session(ws, f'session-{self._next_id()}')
+                session.shard = tuple(data.get('shard') or (0, 1))
+                session.intents = data.get('intents', 0)
+                self._sessions[session.session_id] = session
+                guilds = self._guilds_on(session.shard)
+                await session.dispatch('READY', {
+                    'v': 10, 'user': self._user(BOT_ID, bot=True), 'session_id': session.session_id,
+                    'resume_gateway_url': self.url.replace('http', 'ws', 1) + '/gateway', 'shard': list(session.shard),
+                    'guilds': [{'id': str(guild_id), 'unavailable': True} for guild_id in guilds],
+                    'application': {'id': str(APPLICATION_ID), 'flags': 0}})
+                for guild_id in guilds:
+                    await session.dispatch('GUILD_CREATE', self._guild(guild_id))
+            elif op == 6:
+                session = self._sessions.get(data.get('session_id'))
+                if session is None:
+                    await ws.send_str(json.dumps({'op': 9, 'd': False}))  # invalid session, identify again
+                    continue
+                session.ws = ws
+                forced = self._reconnects.pop(session.session_id, None)
+                if forced is not None:
+                    self.resume_latency.append(time.monotonic() - forced)
+                await session.dispatch('RESUMED', {})
+        return ws
+
+    def _session_for(self, guild_id):
+        for session in self._sessions.values():
+            shard_id, shard_count = session.shard
+            if not session.ws.closed and (guild_id >> 22) % shard_count == shard_id:
+                return session
+        return None
+
+    async def command(self, channel_id, content, user_id):
+        """
+        Dispatch a MESSAGE_CREATE as if `user_id` typed `content` in a guild channel;
+        like Discord, only to a session that asked for the guild messages intent
+        """
+        guild_id = self.channels[channel_id]
+        session = self._session_for(guild_id)
+        if session is None or not session.intents & GUILD_MESSAGES:
+            return False
+        message = self._message(channel_id, content, author=self._user(user_id))
+        message['member'] = {'roles': [], 'joined_at': _iso(), 'deaf': False, 'mute': False, 'flags': 0}
+        self.commands_sent += 1
+        self._pending.setdefault(channel_id, []).append(time.time())
+        try:
+            await session.dispatch('MESSAGE_CREATE', message)
+        except ConnectionError:
+            return False
+        return True
+
+    async def reconnect(self, abrupt=False):
+        """Make every connected session reconnect: op 7, or a dropped socket when `abrupt`"""
+        for session in list(self._sessions.values()):
+            if session.ws.closed:
+                continue
+            self._reconnects[session.session_id] = time.monotonic()
+            if abrupt:
+                await session.ws.close(code=4000, message=b'load test')
+            else:
+                await session.ws.send_str(json.dumps({'op': 7, 'd': None}))
+
+    # -- server ------------------------------------------------------------
+
+    def app(self):
+        app = web.Application(middlewares=[self._rest], client_max_size=2**22)
+        api = '/api/v10'
+        app.router.add_get(f'{api}/users/@me', self._get_user)
+        app.router.add_get(f'{api}/oauth2/applications/@me', self._get_application)
+        app.router.add_get(f'{api}/gateway/bot', self._get_gateway)
+        app.router.add_get(f'{api}/channels/{{channel_id}}', self._get_channel)
+        app.router.add_post(f'{api}/channels/{{channel_id}}/messages', self._post_message)
+        app.router.add_post(f'{api}/channels/{{channel_id}}/messages/bulk-delete', self._bulk_delete)
+        app.router.add_patch(f'{api}/channels/{{channel_id}}/messages/{{message_id}}', self._edit_message)
+        app.router.add_delete(f'{api}/channels/{{channel_id}}/messages/{{message_id}}', self._delete_message)
+        app.router.add_post(f'{api}/users/@me/channels', self._open_dm)
+        app.router.add_put(f'{api}/applications/{{application_id}}/commands', self._sync_commands)
+        app.router.add_get('/gateway', self._gateway)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Serve on host:port (0 picks a free port); returns the DISCORD_API base URL"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{port}'
+        return f'{self.url}/api/v10'
+
+    async def stop(self):
+        for session in self._sessions.values():
+            if not session.ws.closed:
+                await session.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def serve(args):
+    fake = FakeDiscord(args.guilds, args.channels_per_guild, latency=args.latency,
+                       rate_limit_rate=args.rate_limit_rate, forbidden=args.forbidden)
+    api = await fake.start(port=args.port)
+    print(f"🧪 Fake Discord for {len(fake.guilds)} guilds / {len(fake.channels)} channels: DISCORD_API={api}")
+    print(f"   CHANNEL_IDS={','.join(map(str, fake.guild_channels()[:5]))},...")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--channels-per-guild', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every REST call')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of posts answered with a 429')
+    parser.add_argument('--forbidden', type=float, default=0.0, help='fraction of channels answering 403')
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+"""
+End-to-end load test of Bot.py against a local fake Discord.
+
+    python -m bench.loadtest [scenario ...] [--guilds 2000] [--reminder-channels 500]
+                             [--label before] [--compare before] [--json results.json]
+
+Each scenario starts a FakeDiscord (bench.fake_discord) with thousands of
+guilds, writes a schedule whose warnings fire over the next few minutes and
+runs the real bot (`python Bot.py`) against it in a subprocess, with
+DISCORD_API / DISCORD_GATEWAY pointing at the fake. While reminders fire the
+runner can spam prefix commands over the gateway, force reconnects, and the
+fake answers with 429s and 403s as configured.
+
+Fire-to-delivery latency is measured from the outside: the fire instant is
+known from the schedule (each warning's lead says which fire it belongs to,
+even when a slow fan-out runs into the next one) and the fake timestamps
+every message it receives.
+Reported per scenario: time until the health port accepts connections and
+until /health (booted, reminders scheduled) and /ready (gateway ready)
+answer 200, the bot's own startup stages, p50/p99 delivery latency,
+deliveries per second, command reply latency, reconnect time, CPU seconds
+and peak RSS of the bot process (from /proc), plus counters
+scraped from /metrics (gateway events received, 429s, loop stalls). The
+fake only sends MESSAGE_CREATE to sessions with the guild messages intent,
+so `command_spam` against `low_footprint` compares the two gateway modes.
+Every run is appended to --results with a label and the git commit, so
+`--compare LABEL` can show the change against an earlier run.
+Exits non-zero if a reminder delivery is missing or duplicated.
+
+Scenarios wait for real minute boundaries, so each takes two to three minutes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+from bench.fake_discord import FakeDiscord
+from bench.replay import summarize
+from subscriptions import SubscriptionStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(ROOT, 'bench', 'loadtest-results.jsonl')
+EVENT = 'Load Test'
+LEAD = re.compile(r' in (\d+)min ')
+BOOT_MARGIN = 30      # seconds between launching the bot and the first fire
+DELIVERY_TIMEOUT = 60  # seconds after the last fire before missing deliveries are given up on
+COMMANDS = ('!schedule', '!times', '!worldboss', '!debug')
+
+Scenario = namedtuple('Scenario', ['description', 'fake', 'env', 'subscribers', 'spam_rate', 'reconnect_every'],
+                      defaults=({}, {}, 0, 0.0, 0.0))
+
+SCENARIOS = {
+    'baseline': Scenario('Reminders fan out to every channel, nothing goes wrong'),
+    'rate_limits': Scenario('5% of posts get a 429 and 2% of channels answer 403',
+                            fake={'rate_limit_rate': 0.05, 'forbidden': 0.02}),
+    'command_spam': Scenario('200 commands/s from 500 users in 50 channels while reminders go out',
+                             spam_rate=200.0),
+    'reconnects': Scenario('The gateway reconnects every 5 s (op 7 and dropped sockets alternately)',
+                           reconnect_every=5.0),
+    'subscribers': Scenario('Reminders plus DMs to 1000 personal subscribers', subscribers=1000),
+    'low_footprint': Scenario('command_spam with LOW_FOOTPRINT=1: guilds intent only, so no message events',
+                              env={'LOW_FOOTPRINT': '1'}, spam_rate=200.0),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def proc_usage(pid):
+    """(CPU seconds, resident bytes) of a process from /proc, or None where there is no /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            resident = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK')
+    return (int(fields[11]) + int(fields[12])) / ticks, resident * os.sysconf('SC_PAGE_SIZE')
+
+
+def parse_metrics(text, names):
+    """Sum every sample of each metric in `names` from Prometheus text"""
+    totals = dict.fromkeys(names, 0.0)
+    for line in text.splitlines():
+        if line.startswith('#') or not line.strip():
+            continue
+        name = line.split('{', 1)[0].split(' ', 1)[0]
+        if name in totals:
+            totals[name] += float(line.rsplit(' ', 1)[1])
+    return totals
+
+
+def write_schedule(path, first_fire, fires):
+    """A one-event schedule (UTC) whose warnings fire at first_fire and each following minute"""
+    event = first_fire + timedelta(minutes=fires)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'games': [{'name': 'Bench', 'events': [{
+            'name': EVENT, 'icon': '🧪', 'times': [f"{event:%H:%M}"], 'leads': list(range(fires, 0, -1))}]}]}, f)
+    return [(first_fire + timedelta(minutes=n)).timestamp() for n in range(fires)]
+
+
+def add_subscribers(path, count):
+    store = SubscriptionStore(path)
+    for user_id in range(1, count + 1):
+        store.subscribe(10**6 + user_id, 'Asia/Manila' if user_id % 2 else 'America/New_York', [], 'dm', 0)
+    store.close()
+
+
+def parse_startup(text):
+    """{stage: seconds} from the bot_startup_seconds gauge"""
+    stages = {}
+    for line in text.splitlines():
+        if line.startswith('bot_startup_seconds{stage="'):
+            labels, value = line.rsplit(' ', 1)
+            stages[labels.split('"')[1]] = float(value)
+    return stages
+
+
+async def wait_port(port, proc, deadline):
+    """Wait until the port accepts connections"""
+    while time.monotonic() < deadline and proc.returncode is None:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            await asyncio.sleep(0.005)
+            continue
+        writer.close()
+        return True
+    return False
+
+
+async def wait_healthy(session, url, proc, deadline):
+    while time.monotonic() < deadline and proc.returncode is None:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return True
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def spam(fake, channels, rate, users=500):
+    """Dispatch `rate` commands per second from random users in `channels`"""
+    rng = random.Random(1)
+    tick = 0.05
+    while True:
+        for _ in range(max(1, round(rate * tick))):
+            await fake.command(rng.choice(channels), rng.choice(COMMANDS), 2 * 10**6 + rng.randrange(users))
+        await asyncio.sleep(tick)
+
+
+async def reconnect(fake, every):
+    abrupt = False
+    while True:
+        await asyncio.sleep(every)
+        await fake.reconnect(abrupt=abrupt)
+        abrupt = not abrupt
+
+
+async def sample(pid, samples):
+    while True:
+        usage = proc_usage(pid)
+        if usage is not None:
+            samples.append((time.time(),) + usage)
+        await asyncio.sleep(0.25)
+
+
+async def run_scenario(name, scenario, args):
+    fake = FakeDiscord(args.guilds, args.channels_per_guild, latency=args.latency, **scenario.fake)
+    api = await fake.start()
+    # Reminder channels are spread over all the guilds; forbidden ones still get sent to
+    everything = sorted(fake.channels)
+    step = max(1, len(everything) // args.reminder_channels)
+    channels = everything[::step][:args.reminder_channels]
+    reachable = [channel_id for channel_id in channels if channel_id not in fake.forbidden]
+
+    workdir = tempfile.mkdtemp(prefix=f'loadtest-{name}-')
+    now = datetime.now(timezone.utc)
+    first_fire = (now + timedelta(seconds=BOOT_MARGIN + 60)).replace(second=0, microsecond=0)
+    fire_times = write_schedule(os.path.join(workdir, 'schedules.json'), first_fire, args.fires)
+    subscriptions_db = os.path.join(workdir, 'subscriptions.db')
+    if scenario.subscribers:
+        add_subscribers(subscriptions_db, scenario.subscribers)
+    health_port = free_port()
+    env = dict(os.environ, DISCORD_BOT_TOKEN='loadtest', DISCORD_API=api,
+               DISCORD_GATEWAY=fake.url.replace('http', 'ws', 1) + '/gateway',
+               CHANNEL_ID=str(channels[0]), CHANNEL_IDS=','.join(map(str, channels)), TIMEZONE='UTC',
+               SCHEDULE_FILE=os.path.join(workdir, 'schedules.json'), SUBSCRIPTIONS_DB=subscriptions_db,
+               JOURNAL_PATH=os.path.join(workdir, 'reminders.journal'), PORT=str(health_port),
+               SYNC_COMMANDS='0', ANNOUNCE_ONLINE='0', LOG_LEVEL='WARNING', LOW_FOOTPRINT='0',
+               COUNTDOWN='0', LEASE_DB='', SHARD_COUNT='', AUTO_SHARD='0')
+    env.update(scenario.env)
+
+    log_path = os.path.join(workdir, 'bot.log')
+    launched = time.monotonic()
+    with open(log_path, 'w') as bot_log:
+        proc = await asyncio.create_subprocess_exec(sys.executable, os.path.join(ROOT, 'Bot.py'), cwd=workdir,
+                                                    env=env, stdout=bot_log, stderr=subprocess.STDOUT)
+    samples, drivers = [], []
+    drivers.append(asyncio.create_task(sample(proc.pid, samples)))
+    try:
+        async with aiohttp.ClientSession() as session:
+            listening = await wait_port(health_port, proc, launched + BOOT_MARGIN)
+            port_seconds = time.monotonic() - launched if listening else None
+            healthy = await wait_healthy(session, f'http://127.0.0.1:{health_port}/health', proc,
+                                         launched + BOOT_MARGIN + 60)
+            health_seconds = time.monotonic() - launched if healthy else None
+            ready = await wait_healthy(session, f'http://127.0.0.1:{health_port}/ready', proc,
+                                       launched + BOOT_MARGIN + 60)
+            ready_seconds = time.monotonic() - launched if ready else None
+            ready_at = time.time()
+            fake.reset()  # only count what happens from here on
+            guild_channels = fake.guild_channels()
+            if scenario.spam_rate:
+                drivers.append(asyncio.create_task(spam(fake, guild_channels[:50], scenario.spam_rate)))
+            if scenario.reconnect_every:
+                drivers.append(asyncio.create_task(reconnect(fake, scenario.reconnect_every)))
+
+            expected = len(reachable) + scenario.subscribers
+            deadline = fire_times[-1] + DELIVERY_TIMEOUT
+            while time.time() < deadline and proc.returncode is None:
+                if time.time() > fire_times[-1] and sum(p.reminder for p in fake.posted) >= expected * len(fire_times):
+                    break
+                await asyncio.sleep(0.25)
+            ended = time.time()
+            exited_early = proc.returncode is not None
+            try:
+                async with session.get(f'http://127.0.0.1:{health_port}/metrics') as response:
+                    text = await response.text()
+                scraped = parse_metrics(text, ('bot_discord_rate_limited_total', 'bot_event_loop_stalls_total',
+                                               'bot_commands_suppressed_total', 'bot_gateway_events_total'))
+                startup = parse_startup(text)
+            except aiohttp.ClientError:
+                scraped, startup = {}, {}
+    finally:
+        for driver in drivers:
+            driver.cancel()
+        await asyncio.gather(*drivers, return_exceptions=True)
+        if proc.returncode is None:
+            proc.send_signal(2)
+            try:
+                await asyncio.wait_for(proc.wait(), 10)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+        await fake.stop()
+
+    # Attribute each reminder message to the fire instant it follows
+    latencies, deliveries = [], Counter()
+    last_arrival = {}
+    for posted in fake.posted:
+        if not posted.reminder:
+            continue
+        lead = LEAD.search(posted.content)
+        if lead is None:
+            continue
+        index = len(fire_times) - int(lead.group(1))
+        latencies.append(posted.at - fire_times[index])
+        deliveries[(index, posted.channel_id)] += 1
+        last_arrival[index] = max(last_arrival.get(index, 0), posted.at)
+    delivered = len(deliveries)
+    spread = sum(last_arrival[index] - fire_times[index] for index in last_arrival)
+
+    window = [s for s in samples if fire_times[0] - 1 <= s[0] <= ended]
+    boot = [s for s in samples if s[0] <= ready_at]
+    cpu = window[-1][1] - window[0][1] if len(window) > 1 else None
+    return {
+        'scenario': name,
+        'description': scenario.description,
+        'config': {'guilds': args.guilds, 'channels': len(fake.channels), 'reminder_channels': len(channels),
+                   'fires': args.fires, 'subscribers': scenario.subscribers, 'spam_rate': scenario.spam_rate,
+                   'reconnect_every': scenario.reconnect_every, 'latency': args.latency, **scenario.fake,
+                   **scenario.env},
+        'port_seconds': port_seconds,
+        'health_seconds': health_seconds,
+        'ready_seconds': ready_seconds,
+        'startup_s': startup,
+        'exited_early': exited_early,
+        'expected': expected * len(fire_times),
+        'delivered': delivered,
+        'missing': expected * len(fire_times) - delivered,
+        'duplicates': sum(count - 1 for count in deliveries.values()),
+        'latency_s': summarize(latencies),
+        'throughput_per_s': delivered / spread if spread > 0 else None,
+        'served_429': dict(fake.rate_limited),
+        'commands': {'sent': fake.commands_sent,
+                     'replies': sum(not p.reminder for p in fake.posted),
+                     'reply_latency_s': summarize(fake.reply_latency)},
+        'reconnects': {'identifies': fake.identifies, 'resume_s': summarize(fake.resume_latency)},
+        'cpu_seconds': cpu,
+        'cpu_percent': 100 * cpu / (window[-1][0] - window[0][0]) if cpu is not None and window[-1][0] > window[0][0] else None,
+        'boot_cpu_seconds': boot[-1][1] if boot else None,
+        'rss_peak_mb': max(s[2] for s in samples) / 2**20 if samples else None,
+        'metrics': scraped,
+        'log': log_path,
+    }
+
+
+def _ms(stats, key):
+    return f"{stats[key] * 1000:7.1f}ms" if stats.get('count') else '      –  '
+
+
+def report(r):
+    """Print one scenario's results; returns the number of problems"""
+    print(f"🧪 {r['scenario']}: {r['description']}")
+    port, health, ready = (f"{r[key]:.2f}s" if r.get(key) is not None else 'never'
+                           for key in ('port_seconds', 'health_seconds', 'ready_seconds'))
+    print(f"  {r['config']['guilds']} guilds, {r['config']['reminder_channels']} reminder channels, "
+          f"port open after {port}, /health 200 after {health}, /ready 200 after {ready}")
+    if r['startup_s']:
+        print(f"  startup: {', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in r['startup_s'].items())}")
+    latency = r['latency_s']
+    throughput = f"{r['throughput_per_s']:.1f}/s" if r['throughput_per_s'] else '–'
+    print(f"  delivered {r['delivered']}/{r['expected']}  p50 {_ms(latency, 'p50')}  p99 {_ms(latency, 'p99')}  "
+          f"max {_ms(latency, 'max')}  throughput {throughput}")
+    if r['served_429']:
+        print(f"  429s served: {', '.join(f'{scope} {n}' for scope, n in sorted(r['served_429'].items()))}")
+    if r['commands']['sent']:
+        replies = r['commands']['reply_latency_s']
+        print(f"  commands {r['commands']['sent']} -> {r['commands']['replies']} replies, "
+              f"answered p50 {_ms(replies, 'p50')}  p99 {_ms(replies, 'p99')}")
+    if r['reconnects']['resume_s'].get('count'):
+        resume = r['reconnects']['resume_s']
+        print(f"  reconnects {resume['count']}: resumed p50 {_ms(resume, 'p50')}  max {_ms(resume, 'max')}, "
+              f"identifies {r['reconnects']['identifies']}")
+    if r['cpu_seconds'] is not None:
+        print(f"  CPU {r['cpu_seconds']:.2f}s ({r['cpu_percent']:.0f}%) while firing, "
+              f"{r['boot_cpu_seconds']:.2f}s to get ready, peak RSS {r['rss_peak_mb']:.1f} MB")
+    if r['metrics'].get('bot_gateway_events_total'):
+        print(f"  gateway events received {r['metrics']['bot_gateway_events_total']:.0f}")
+    if r['missing'] or r['duplicates'] or r['exited_early']:
+        print(f"❌ {r['missing']} missing, {r['duplicates']} duplicate deliveries"
+              f"{', the bot exited early' if r['exited_early'] else ''} (bot log: {r['log']})")
+        return r['missing'] + r['duplicates'] + 1
+    return 0
+
+
+# (label, key path, lower is better)
+COMPARED = [
+    ('port', ('port_seconds',), True),
+    ('health', ('health_seconds',), True),
+    ('ready', ('ready_seconds',), True),
+    ('reminders ready', ('startup_s', 'reminders'), True),
+    ('p50', ('latency_s', 'p50'), True),
+    ('p99', ('latency_s', 'p99'), True),
+    ('throughput', ('throughput_per_s',), False),
+    ('reply p99', ('commands', 'reply_latency_s', 'p99'), True),
+    ('CPU', ('cpu_seconds',), True),
+    ('RSS', ('rss_peak_mb',), True),
+    ('gateway events', ('metrics', 'bot_gateway_events_total'), True),
+]
+
+
+def _get(result, path):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(results, path, label):
+    """Print each metric against the latest stored run of the same scenario labelled `label`"""
+    baseline = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stored = json.loads(line)
+                if stored.get('label') == label:
+                    baseline[stored['scenario']] = stored
+    except OSError:
+        pass
+    for r in results:
+        before = baseline.get(r['scenario'])
+        if before is None:
+            print(f"📊 {r['scenario']}: no stored run labelled {label!r}")
+            continue
+        changes = []
+        for name, key, lower_is_better in COMPARED:
+            old, new = _get(before, key), _get(r, key)
+            if not old or new is None:
+                continue
+            delta = (new - old) / old * 100
+            better = (delta < 0) == lower_is_better
+            changes.append(f"{name} {old:.3g}→{new:.3g} ({'🟢' if better or abs(delta) < 2 else '🔴'}{delta:+.0f}%)")
+        print(f"📊 {r['scenario']} vs {label} ({before.get('commit') or '?'}): {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help=f"default: all of {', '.join(SCENARIOS)}")
+    parser.add_argument('--guilds', type=int, default=2000)
+    parser.add_argument('--channels-per-guild', type=int, default=2)
+    parser.add_argument('--reminder-channels', type=int, default=500, help='channels in CHANNEL_IDS')
+    parser.add_argument('--fires', type=int, default=2, help='warnings per scenario, one minute apart')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the fake adds to every REST call')
+    parser.add_argument('--label', default='', help='name stored with the results, e.g. before / after')
+    parser.add_argument('--results', default=RESULTS_FILE, help='JSON lines file the runs are appended to')
+    parser.add_argument('--compare', metavar='LABEL', help='compare against the latest stored run with this label')
+    parser.add_argument('--json', help='also write this run to this file')
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    commit, started = git_commit(), datetime.now(timezone.utc).isoformat(timespec='seconds')
+    results, problems = [], 0
+    for name in args.scenarios or SCENARIOS:
+        result = asyncio.run(run_scenario(name, SCENARIOS[name], args))
+        result.update(label=args.label, commit=commit, started=started)
+        results.append(result)
+        problems += report(result)
+    if not problems:
+        print("✅ Every reminder reached every channel exactly once")
+
+    if args.compare:
+        compare(results, args.results, args.compare)
+    with open(args.results, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Replay a full year of reminders on a simulated clock.
+
+    python -m bench.replay [--year 2026] [--no-alloc] [--json results.json]
+
+A SimulatedClock is stepped minute by minute through the whole year (both
+Lisbon DST transitions included) while the real reminder path runs on it:
+ReminderScheduler -> reminder_message -> Broadcaster -> a fake transport
+that records every send. The emitted messages are checked against an
+oracle enumerated straight from the reminder tables, plus hand-written
+expectations for the DST days, and the !schedule status helpers are checked
+against the fires on every ordinary day.
+
+Reports CPU time per tick (idle ticks and firing ticks separately), the
+number of scheduler wakeups and, unless --no-alloc, bytes allocated per tick.
+Exits non-zero if any message is missing, extra or wrong.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from broadcast import Broadcaster
+from clock import SimulatedClock
+from responses import ScheduleResponses
+from schedule import INDEX, REMINDERS, reminder_message
+from scheduler import ReminderScheduler
+
+TZ = ZoneInfo('Europe/Lisbon')
+CHANNEL_ID = 1
+
+
+class FakeTransport:
+    """Stands in for the Discord REST transport and records every send"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, channel_id, content):
+        self.sent.append((channel_id, content))
+        return None, 0.0
+
+
+def dst_dates(year):
+    """Local dates on which the UTC offset changes"""
+    dates = []
+    day = date(year, 1, 1)
+    while day.year == year:
+        start = datetime(day.year, day.month, day.day, tzinfo=TZ)
+        if start.utcoffset() != (start + timedelta(days=1)).utcoffset():
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def expected_messages(start, end):
+    """Oracle: every (fire instant, message) in [start, end), straight from the tables"""
+    expected = set()
+    day = start.astimezone(TZ).date() - timedelta(days=1)
+    while datetime(day.year, day.month, day.day, tzinfo=TZ) < end + timedelta(days=1):
+        for reminder in REMINDERS:
+            event_utc = datetime(day.year, day.month, day.day, reminder.hour, reminder.minute,
+                                 tzinfo=TZ).astimezone(timezone.utc)
+            fire_utc = event_utc - timedelta(minutes=reminder.lead)
+            if start <= fire_utc < end:
+                expected.add((fire_utc, reminder_message(reminder, event_utc)))
+        day += timedelta(days=1)
+    return expected
+
+
+def dst_expectations(year):
+    """Hand-checked fires around the Lisbon DST changes of `year` (UTC instants)"""
+    spring, autumn = dst_dates(year)
+    checks = []
+    # Spring: 01:00 WET jumps to 02:00 WEST. The 1:00 World Boss (a skipped
+    # wall time) still gets its warning at 00:58 UTC, the 1:10 one at 01:08 UTC.
+    checks.append((datetime(spring.year, spring.month, spring.day, 0, 58, tzinfo=timezone.utc), 'World Boss in 2min at 1:00 AM'))
+    checks.append((datetime(spring.year, spring.month, spring.day, 1, 8, tzinfo=timezone.utc), 'World Boss in 2min at 1:10 AM'))
+    # Autumn: 02:00 WEST falls back to 01:00 WET. The 2:00 Nation War starts
+    # at 02:00 UTC, so its warnings fire once, at 01:55 and 01:59 UTC.
+    checks.append((datetime(autumn.year, autumn.month, autumn.day, 1, 55, tzinfo=timezone.utc), 'Nation War in 5min at 2:00 AM'))
+    checks.append((datetime(autumn.year, autumn.month, autumn.day, 1, 59, tzinfo=timezone.utc), 'Nation War in 1min at 2:00 AM'))
+    return checks
+
+
+def summarize(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'max': ordered[-1],
+    }
+
+
+async def replay(year, trace_alloc):
+    start = datetime(year, 1, 1, tzinfo=TZ).astimezone(timezone.utc)
+    end = datetime(year + 1, 1, 1, tzinfo=TZ).astimezone(timezone.utc)
+    clock = SimulatedClock(start)
+    transport = FakeTransport()
+    broadcaster = Broadcaster(transport, global_rate=10**9)  # no real-time pacing on a simulated clock
+    responses = ScheduleResponses(TZ, clock=clock)
+    fires = []
+
+    async def send_reminder(reminder, event_utc):
+        message = reminder_message(reminder, event_utc)
+        fires.append((clock.now(), reminder, message))
+        await broadcaster.broadcast([CHANNEL_ID], message)
+
+    scheduler = ReminderScheduler(INDEX, TZ, send_reminder, clock=clock)
+    scheduler.start()
+    await clock.settle()
+
+    skip_status = set(dst_dates(year))
+    idle_cpu, fire_cpu, idle_alloc, fire_alloc, status_cpu = [], [], [], [], []
+    status_mismatches = []
+    if trace_alloc:
+        tracemalloc.start()
+
+    while clock.now() < end:
+        fired_before = len(fires)
+        if trace_alloc:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        began = time.process_time_ns()
+        clock.advance(60)
+        await clock.settle()
+        spent = time.process_time_ns() - began
+        fired = len(fires) > fired_before
+        (fire_cpu if fired else idle_cpu).append(spent)
+        if trace_alloc:
+            (fire_alloc if fired else idle_alloc).append(tracemalloc.get_traced_memory()[1] - before)
+
+        # !schedule status should agree with what just fired on ordinary days
+        now = clock.now()
+        began = time.process_time_ns()
+        nation_war_event, _ = responses.nation_war_status(now)
+        world_boss_event, _, _ = responses.world_boss_status(now)
+        status_cpu.append(time.process_time_ns() - began)
+        if now.astimezone(TZ).date() not in skip_status:
+            fired_now = {(r.event, r.lead) for _, r, _ in fires[fired_before:]}
+            expect_nw = ('Nation War', INDEX.leads('Nation War')[0]) in fired_now
+            expect_wb = any(event == 'World Boss' for event, _ in fired_now)
+            if bool(nation_war_event) != expect_nw or bool(world_boss_event) != expect_wb:
+                status_mismatches.append(now.isoformat())
+
+    if trace_alloc:
+        tracemalloc.stop()
+    scheduler.stop()
+
+    emitted = {(fire_utc, message) for fire_utc, _, message in fires}
+    expected = expected_messages(start, end)
+    missing = sorted(expected - emitted)
+    extra = sorted(emitted - expected)
+    duplicates = len(fires) - len(emitted)
+    dst_failures = [f"{fire_utc.isoformat()} {text}" for fire_utc, text in dst_expectations(year)
+                    if not any(f == fire_utc and text in m for f, _, m in fires)]
+    delivered = len(transport.sent)
+
+    return {
+        'year': year,
+        'ticks': len(idle_cpu) + len(fire_cpu),
+        'reminders': len(fires),
+        'delivered': delivered,
+        'scheduler_wakeups': clock.wakeups,
+        'missing': [f"{f.isoformat()} {m}" for f, m in missing],
+        'extra': [f"{f.isoformat()} {m}" for f, m in extra],
+        'duplicates': duplicates,
+        'dst_failures': dst_failures,
+        'status_mismatches': status_mismatches,
+        'cpu_ns': {'idle_tick': summarize(idle_cpu), 'fire_tick': summarize(fire_cpu),
+                   'status_lookup': summarize(status_cpu)},
+        'alloc_bytes': ({'idle_tick': summarize(idle_alloc), 'fire_tick': summarize(fire_alloc)}
+                        if trace_alloc else None),
+    }
+
+
+def report(results):
+    print(f"📅 Replayed {results['year']}: {results['ticks']} ticks, {results['reminders']} reminders, "
+          f"{results['delivered']} deliveries, {results['scheduler_wakeups']} scheduler wakeups")
+    for name, stats in results['cpu_ns'].items():
+        if stats['count']:
+            print(f"  CPU {name:<14} mean {stats['mean'] / 1000:8.1f}µs  p50 {stats['p50'] / 1000:8.1f}µs  "
+                  f"p99 {stats['p99'] / 1000:8.1f}µs  max {stats['max'] / 1000:8.1f}µs  (n={stats['count']})")
+    if results['alloc_bytes']:
+        for name, stats in results['alloc_bytes'].items():
+            if stats['count']:
+                print(f"  alloc {name:<12} mean {stats['mean']:8.0f}B  p99 {stats['p99']:8.0f}B  max {stats['max']:8.0f}B")
+    problems = 0
+    for key in ('missing', 'extra', 'dst_failures', 'status_mismatches'):
+        if results[key]:
+            problems += len(results[key])
+            print(f"❌ {len(results[key])} {key.replace('_', ' ')}, e.g. {results[key][0]}")
+    if results['duplicates']:
+        problems += results['duplicates']
+        print(f"❌ {results['duplicates']} duplicate reminders")
+    if not problems:
+        print("✅ Every reminder fired exactly once at the expected instant")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--year', type=int, default=datetime.now().year)
+    parser.add_argument('--no-alloc', action='store_true', help='skip allocation tracing (faster)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = asyncio.run(replay(args.year, not args.no_alloc))
+    problems = report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
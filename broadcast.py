@@ -0,0 +1,376 @@
+"""
+Concurrent reminder fan-out to many channels.
+
+Every channel gets its own rate-limit bucket (Discord buckets message sends
+per channel), so a 429 on one channel only delays that channel, which keeps
+retrying after each retry_after until its deadline (a reminder's next warning,
+or the event start) rather than for a fixed number of attempts. A global
+pacer keeps the whole fan-out under Discord's global request limit, leaving
+headroom for discord.py's own calls, and a global 429 pauses every sender
+until it clears or their deadline passes; share_global_gate() makes that
+pause common with discord.py's HTTP client.
+The number of requests in flight is bounded by a semaphore that is only held
+for the HTTP call itself, never while a bucket is waiting.
+"""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import aiohttp
+
+import metrics
+
+log = logging.getLogger('bot.broadcast')
+
+DISCORD_API = 'https://discord.com/api/v10'
+GLOBAL_RATE = 40          # requests per second; Discord allows 50, the rest is left to discord.py
+MAX_CONCURRENCY = 50      # requests in flight at once
+LATENCY_TARGET = 5.0      # seconds from fire instant to last delivery, and the default retry deadline
+BULK_DELETE_LIMIT = 100   # messages per bulk-delete call
+DELETE_DEADLINE = 60.0    # seconds a cleanup keeps retrying rate-limited deletes
+
+# delivered: targets that got the call; retry: targets that failed in a way worth retrying later
+BroadcastResult = namedtuple('BroadcastResult', ['sent', 'failed', 'rate_limited', 'latency', 'delivered', 'retry'],
+                             defaults=((), ()))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after, is_global=False):
+        super().__init__(f"rate limited for {retry_after:.2f}s{' (global)' if is_global else ''}")
+        self.retry_after = retry_after
+        self.is_global = is_global
+
+
+class SendError(Exception):
+    """Send failure other than a 429: missing access, unknown channel, a Discord outage, ..."""
+
+    def __init__(self, status, message=''):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def retryable(error):
+    """Whether a failed call may succeed later (server errors, timeouts, 429s) rather than never (4xx)"""
+    return not isinstance(error, SendError) or error.status >= 500
+
+
+class RestTransport:
+    """Minimal Discord REST client for sending, editing and deleting messages, exposing rate-limit headers"""
+
+    def __init__(self, token, base_url=DISCORD_API):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={
+                'Authorization': f'Bot {self.token}',
+                'User-Agent': 'DiscordBot (discord-bot reminders, 1.0)',
+            })
+        return self._session
+
+    async def _request(self, method, path, payload=None):
+        """
+        Make one REST call. Returns (json body or None, remaining, reset_after) from
+        the bucket headers; raises RateLimited on 429 and SendError on other failures.
+        """
+        session = await self._get_session()
+        async with session.request(method, f"{self.base_url}{path}", json=payload) as response:
+            headers = response.headers
+            if response.status == 429:
+                data = await response.json(content_type=None)
+                is_global = data.get('global', False) or headers.get('X-RateLimit-Global') == 'true'
+                raise RateLimited(float(data.get('retry_after', 1.0)), is_global)
+            if response.status >= 400:
+                raise SendError(response.status, await response.text())
+            data = await response.json(content_type=None) if response.status != 204 else None
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset_after = headers.get('X-RateLimit-Reset-After')
+            return (data,
+                    int(remaining) if remaining is not None else None,
+                    float(reset_after) if reset_after is not None else 0.0)
+
+    async def send(self, channel_id, content):
+        """POST a message. Returns (remaining, reset_after) from the bucket headers"""
+        _, remaining, reset_after = await self._request('POST', f"/channels/{channel_id}/messages", {'content': content})
+        return remaining, reset_after
+
+    async def create_message(self, channel_id, content):
+        """POST a message. Returns (message id, remaining, reset_after)"""
+        data, remaining, reset_after = await self._request('POST', f"/channels/{channel_id}/messages", {'content': content})
+        return int(data['id']), remaining, reset_after
+
+    async def edit_message(self, channel_id, message_id, content):
+        """PATCH a message's content. Returns (remaining, reset_after)"""
+        _, remaining, reset_after = await self._request(
+            'PATCH', f"/channels/{channel_id}/messages/{message_id}", {'content': content})
+        return remaining, reset_after
+
+    async def delete_messages(self, channel_id, message_ids):
+        """Delete up to 100 messages of one channel in a single call. Returns (remaining, reset_after)"""
+        if len(message_ids) == 1:
+            _, remaining, reset_after = await self._request('DELETE', f"/channels/{channel_id}/messages/{message_ids[0]}")
+        else:
+            _, remaining, reset_after = await self._request(
+                'POST', f"/channels/{channel_id}/messages/bulk-delete",
+                {'messages': [str(message_id) for message_id in message_ids]})
+        return remaining, reset_after
+
+    async def get_channel(self, channel_id):
+        """GET a channel object (for its guild_id)"""
+        data, _, _ = await self._request('GET', f"/channels/{channel_id}")
+        return data
+
+    async def open_dm(self, user_id):
+        """Open (or fetch) the DM channel with a user, returning its id"""
+        data, _, _ = await self._request('POST', "/users/@me/channels", {'recipient_id': str(user_id)})
+        return int(data['id'])
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class _Bucket:
+    """Rate-limit state for one channel"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.blocked_until = 0.0
+
+    async def wait(self):
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Broadcaster:
+    def __init__(self, transport, concurrency=MAX_CONCURRENCY, global_rate=GLOBAL_RATE,
+                 latency_target=LATENCY_TARGET):
+        self.transport = transport
+        self.latency_target = latency_target
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 1.0 / global_rate
+        self._next_slot = 0.0
+        self._global_clear = asyncio.Event()
+        self._global_clear.set()
+        self._global_until = 0.0
+        self._gate_relays = set()  # tasks releasing the waiters of a gate replaced mid-pause
+        self._buckets = {}
+        self._single_delete = set()  # channels that refused bulk-delete (it needs Manage Messages)
+        self.rate_limited = 0  # 429s seen since start
+
+    def _bucket(self, channel_id):
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = _Bucket()
+        return bucket
+
+    async def _pace(self, deadline):
+        """
+        Wait for a global slot so the fan-out stays under the global rate.
+        Returns False when a global pause outlasts `deadline` (time.time()).
+        """
+        if not self._global_clear.is_set():
+            try:
+                await asyncio.wait_for(self._global_clear.wait(), max(0.0, deadline - time.time()))
+            except asyncio.TimeoutError:
+                return False
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return True
+
+    def share_global_gate(self, event):
+        """
+        Use `event` (set while no global limit is in force) as the global pause,
+        so discord.py's HTTP client and the broadcaster stop for each other's
+        global 429s instead of each finding the limit on its own.
+        """
+        old, self._global_clear = self._global_clear, event
+        if not old.is_set():
+            # Mid-pause: carry it over, and wake the senders parked on the old gate when it ends
+            event.clear()
+            relay = asyncio.ensure_future(self._relay_gate(event, old))
+            self._gate_relays.add(relay)
+            relay.add_done_callback(self._gate_relays.discard)
+
+    @staticmethod
+    async def _relay_gate(event, old):
+        await event.wait()
+        old.set()
+
+    def _block_global(self, retry_after):
+        """Hold every sender until a global 429 clears"""
+        until = time.monotonic() + retry_after
+        if until > self._global_until:
+            self._global_until = until
+            self._global_clear.clear()
+            asyncio.get_running_loop().call_later(retry_after, self._release_global, until)
+
+    def _release_global(self, until):
+        if until == self._global_until:
+            self._global_clear.set()
+
+    async def _call_one(self, channel_id, request, fired_at, deadline=None):
+        """
+        Run one REST call for a channel, backing off on its own bucket.
+
+        request: coroutine function returning (result, remaining, reset_after)
+        deadline: time.time() past which a rate-limited call is given up; defaults
+        to the latency target after fired_at (or now)
+        Returns (ok, 429 count, result), or (False, 429 count, error) on failure.
+        """
+        if deadline is None:
+            deadline = (fired_at if fired_at is not None else time.time()) + self.latency_target
+        bucket = self._bucket(channel_id)
+        limited = 0
+        async with bucket.lock:
+            error = None
+            while time.time() + max(0.0, bucket.blocked_until - time.monotonic()) < deadline:
+                await bucket.wait()
+                if not await self._pace(deadline):
+                    break
+                try:
+                    async with self._semaphore:
+                        result, remaining, reset_after = await request()
+                except RateLimited as e:
+                    error = e
+                    limited += 1
+                    self.rate_limited += 1
+                    metrics.RATE_LIMITED.inc(scope='global' if e.is_global else 'channel')
+                    if e.is_global:
+                        self._block_global(e.retry_after)
+                    else:
+                        bucket.blocked_until = time.monotonic() + e.retry_after
+                    continue
+                except Exception as e:
+                    log.warning("❌ Channel %s: %s", channel_id, e, extra={'channel': channel_id, 'sample': 'channel_error'})
+                    return False, limited, e
+                if remaining == 0:
+                    bucket.blocked_until = time.monotonic() + reset_after
+                if fired_at is not None:
+                    metrics.REMINDER_LATENCY.observe(time.time() - fired_at)
+                return True, limited, result
+        log.warning("❌ Channel %s: still rate limited at its deadline (%d 429s)", channel_id, limited,
+                    extra={'channel': channel_id, 'sample': 'channel_rate_limited'})
+        return False, limited, error or RateLimited(0.0)
+
+    async def _send_one(self, channel_id, content, fired_at, deadline):
+        """Deliver to one channel. Returns (ok, 429 count, error)"""
+        async def request():
+            return (None,) + tuple(await self.transport.send(channel_id, content))
+        return await self._call_one(channel_id, request, fired_at, deadline)
+
+    def _result(self, targets, results, fired_at, action='Broadcast'):
+        latency = time.time() - fired_at
+        delivered = tuple(target for target, (ok, _, _) in zip(targets, results) if ok)
+        retry = tuple(target for target, (ok, _, error) in zip(targets, results) if not ok and retryable(error))
+        rate_limited = sum(limited for _, limited, _ in results)
+        if latency > self.latency_target:
+            log.warning("⚠️ %s to %d channels took %.2fs (target %.1fs)", action, len(results), latency,
+                        self.latency_target, extra={'latency': round(latency, 3), 'channels': len(results)})
+        return BroadcastResult(len(delivered), len(results) - len(delivered), rate_limited, latency, delivered, retry)
+
+    async def broadcast(self, channel_ids, content, fired_at=None, deadline=None):
+        """
+        Send `content` to every channel concurrently.
+
+        fired_at: time.time() of the reminder's fire instant; latency is measured
+        from there to the last delivery (defaults to when the broadcast starts).
+        deadline: time.time() until which rate-limited channels keep retrying,
+        e.g. the event start (defaults to the latency target after fired_at).
+        """
+        if fired_at is None:
+            fired_at = time.time()
+        results = await asyncio.gather(*(self._send_one(channel_id, content, fired_at, deadline)
+                                         for channel_id in channel_ids))
+        return self._result(channel_ids, results, fired_at)
+
+    async def post(self, channel_ids, content, fired_at=None, deadline=None):
+        """Like broadcast(), also returning {channel_id: message id} of the messages created"""
+        if fired_at is None:
+            fired_at = time.time()
+
+        results = await asyncio.gather(*(
+            self._call_one(channel_id, lambda channel_id=channel_id: self.transport.create_message(channel_id, content),
+                           fired_at, deadline)
+            for channel_id in channel_ids))
+        messages = {channel_id: message_id for channel_id, (ok, _, message_id) in zip(channel_ids, results) if ok}
+        return self._result(channel_ids, results, fired_at, 'Post'), messages
+
+    async def edit(self, messages, content, fired_at=None, deadline=None):
+        """Edit {channel_id: message id} to `content` concurrently"""
+        if fired_at is None:
+            fired_at = time.time()
+
+        async def edit_one(channel_id, message_id):
+            async def request():
+                return (None,) + tuple(await self.transport.edit_message(channel_id, message_id, content))
+            return await self._call_one(channel_id, request, fired_at, deadline)
+
+        results = await asyncio.gather(*(edit_one(channel_id, message_id) for channel_id, message_id in messages.items()))
+        return self._result(list(messages), results, fired_at, 'Edit')
+
+    async def get_channels(self, channel_ids, deadline=None):
+        """
+        Look up channel objects concurrently, paced and retried like sends.
+        Returns (BroadcastResult over the channel ids, {channel_id: channel object}).
+        """
+        started = time.time()
+
+        async def get_one(channel_id):
+            async def request():
+                return await self.transport.get_channel(channel_id), None, 0.0
+            return await self._call_one(f"channel:{channel_id}", request, None, deadline)
+
+        results = await asyncio.gather(*(get_one(channel_id) for channel_id in channel_ids))
+        channels = {channel_id: channel for channel_id, (ok, _, channel) in zip(channel_ids, results) if ok}
+        return self._result(channel_ids, results, started, 'Channel lookup'), channels
+
+    async def open_dms(self, user_ids, deadline=None):
+        """
+        Open (or fetch) DM channels concurrently, paced and retried like sends.
+        Returns (BroadcastResult over the user ids, {user_id: channel id} opened).
+        """
+        started = time.time()
+
+        async def open_one(user_id):
+            async def request():
+                return await self.transport.open_dm(user_id), None, 0.0
+            return await self._call_one(f"dm:{user_id}", request, None, deadline)
+
+        results = await asyncio.gather(*(open_one(user_id) for user_id in user_ids))
+        opened = {user_id: channel_id for user_id, (ok, _, channel_id) in zip(user_ids, results) if ok}
+        return self._result(user_ids, results, started, 'DM open'), opened
+
+    async def delete(self, messages):
+        """
+        Delete {channel_id: [message ids]}, at most one call per 100 messages of a
+        channel. Bulk-delete needs Manage Messages while deleting our own messages
+        one at a time does not, so a channel that answers 403 to it gets single
+        deletes from then on. Returns messages deleted.
+        """
+        deadline = time.time() + DELETE_DEADLINE
+
+        async def delete_some(channel_id, message_ids):
+            async def request():
+                return (None,) + tuple(await self.transport.delete_messages(channel_id, message_ids))
+            ok, _, error = await self._call_one(channel_id, request, None, deadline)
+            if ok:
+                return len(message_ids)
+            if len(message_ids) > 1 and isinstance(error, SendError) and error.status == 403:
+                self._single_delete.add(channel_id)
+                return sum(await asyncio.gather(*(delete_some(channel_id, [message_id]) for message_id in message_ids)))
+            return 0
+
+        calls = []
+        for channel_id, message_ids in messages.items():
+            size = 1 if channel_id in self._single_delete else BULK_DELETE_LIMIT
+            calls.extend(delete_some(channel_id, message_ids[start:start + size])
+                         for start in range(0, len(message_ids), size))
+        return sum(await asyncio.gather(*calls))
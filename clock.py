@@ -0,0 +1,67 @@
+"""
+Injectable clocks.
+
+Everything time-dependent (the reminder scheduler, command replies) asks a
+clock for "now" and sleeps through it, so the same code can run against the
+wall clock in production or a simulated clock in replays and benchmarks.
+"""
+import asyncio
+import heapq
+from datetime import datetime, timedelta, timezone
+
+
+class SystemClock:
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+class SimulatedClock:
+    """
+    Clock that only moves when told to.
+
+    sleep() parks the caller until advance() moves time past its deadline,
+    so a year of scheduling can be replayed in seconds.
+    """
+
+    def __init__(self, start):
+        self._now = start
+        self._waiters = []  # heap of (deadline, seq, future)
+        self._seq = 0
+        self.wakeups = 0  # sleepers woken so far
+
+    def now(self):
+        return self._now
+
+    async def sleep(self, seconds):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self._now + timedelta(seconds=seconds), self._seq, future))
+        self._seq += 1
+        await future
+
+    @property
+    def sleepers(self):
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def advance(self, seconds):
+        """Move time forward and wake every sleeper whose deadline has passed"""
+        self._now += timedelta(seconds=seconds)
+        while self._waiters and self._waiters[0][0] <= self._now:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self.wakeups += 1
+
+    async def settle(self, sleepers=1, max_steps=1000):
+        """Yield to the loop until `sleepers` tasks are parked on this clock again"""
+        for _ in range(max_steps):
+            await asyncio.sleep(0)
+            if self.sleepers >= sleepers and not any(
+                    deadline <= self._now for deadline, _, future in self._waiters if not future.done()):
+                return
+        raise RuntimeError("simulated clock did not settle")
+
+
+SYSTEM_CLOCK = SystemClock()
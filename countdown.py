@@ -0,0 +1,132 @@
+"""
+Live countdown reminders: one message per event instant per channel, edited
+in place.
+
+Instead of a new message at every warning, the first warning for an event
+start posts a message to each channel and later warnings edit it ("in 5min",
+then "in 1min"); the last warning stays up as it is through the start rather
+than costing another edit. Every event starting at the same instant shares
+one message, and warnings that fire together (the scheduler delivers a fire
+instant's reminders concurrently) are merged into a single edit. A retried
+warning only goes to the channels it missed. Once a countdown has been up
+for `expire_after` past its start it is queued for deletion, and everything
+queued within REAP_DELAY goes out as one bulk delete per channel (single
+deletes where the bot lacks Manage Messages).
+
+On the built-in schedule a channel gets 18 messages a day instead of 27, for
+about 32 calls (18 posts, 9 edits, 5 bulk deletes) against plain mode's 27
+posts: the mode trades a few calls for a tidy channel, it does not save any.
+
+Countdown state lives in memory; messages of a countdown interrupted by a
+restart are left in place.
+"""
+import asyncio
+from datetime import timedelta
+
+from broadcast import BroadcastResult
+from clock import SYSTEM_CLOCK
+from schedule import reminder_message
+
+EXPIRE_AFTER = timedelta(minutes=10)  # how long a finished countdown stays up
+REAP_DELAY = 3 * 3600.0               # seconds expired messages wait to be deleted together
+
+
+class _Countdown:
+    """Messages counting down to the events that start at one instant"""
+
+    def __init__(self, event_utc):
+        self.event_utc = event_utc
+        self.reminders = {}  # (game, event) -> latest reminder fired
+        self.messages = {}   # channel_id -> message id
+        self.channels = set()  # channels the pending flush should reach
+        self.deadline = None   # earliest retry deadline of the warnings in the pending flush
+        self.lock = asyncio.Lock()
+        self.flush = None    # pending merged edit
+
+    def content(self):
+        return '\n'.join(reminder_message(reminder, self.event_utc) for reminder in self.reminders.values())
+
+
+class CountdownDelivery:
+    def __init__(self, broadcaster, channel_ids, clock=SYSTEM_CLOCK, expire_after=EXPIRE_AFTER):
+        """
+        broadcaster: Broadcaster used for the posts, edits and deletes
+        channel_ids: channels that get countdowns
+        clock: source of "now" and sleeps, for expiry
+        """
+        self.broadcaster = broadcaster
+        self.channel_ids = list(channel_ids)
+        self.clock = clock
+        self.expire_after = expire_after
+        self._countdowns = {}  # event_utc -> _Countdown
+        self._expired = {}     # channel_id -> [message ids] awaiting deletion
+        self._reaper = None
+        self._background = set()
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def update(self, reminder, event_utc, fired_at=None, channel_ids=None, deadline=None):
+        """
+        Show `reminder` in the countdown for `event_utc`, posting it on the first
+        warning and editing it after. Returns the BroadcastResult of the merged call.
+
+        channel_ids: the channels still missing this warning (default: all of them)
+        deadline: time.time() until which rate-limited calls retry (default: the event start)
+        """
+        countdown = self._countdowns.get(event_utc)
+        if countdown is None:
+            countdown = self._countdowns[event_utc] = _Countdown(event_utc)
+            self._spawn(self._expire(countdown))
+        countdown.reminders[(reminder.game, reminder.event)] = reminder
+        countdown.channels.update(self.channel_ids if channel_ids is None else channel_ids)
+        deadline = event_utc.timestamp() if deadline is None else deadline
+        countdown.deadline = deadline if countdown.deadline is None else min(countdown.deadline, deadline)
+        if countdown.flush is None:
+            countdown.flush = asyncio.ensure_future(self._flush(countdown, fired_at))
+        return await asyncio.shield(countdown.flush)
+
+    async def _flush(self, countdown, fired_at):
+        await asyncio.sleep(0)  # let the rest of this fire instant's reminders join the edit
+        countdown.flush = None
+        channels, countdown.channels = countdown.channels, set()
+        deadline, countdown.deadline = countdown.deadline, None
+        async with countdown.lock:
+            content = countdown.content()
+            posted = {channel_id: message_id for channel_id, message_id in countdown.messages.items()
+                      if channel_id in channels}
+            missing = [channel_id for channel_id in self.channel_ids if channel_id in channels and channel_id not in posted]
+            calls = []
+            if posted:
+                calls.append(self.broadcaster.edit(posted, content, fired_at=fired_at, deadline=deadline))
+            if missing:
+                calls.append(self._post(countdown, missing, content, fired_at, deadline))
+            results = await asyncio.gather(*calls)
+        return BroadcastResult(sum(r.sent for r in results), sum(r.failed for r in results),
+                               sum(r.rate_limited for r in results), max((r.latency for r in results), default=0.0),
+                               tuple(c for r in results for c in r.delivered), tuple(c for r in results for c in r.retry))
+
+    async def _post(self, countdown, channel_ids, content, fired_at, deadline):
+        result, messages = await self.broadcaster.post(channel_ids, content, fired_at=fired_at, deadline=deadline)
+        countdown.messages.update(messages)
+        return result
+
+    async def _expire(self, countdown):
+        """Queue the countdown's messages for deletion `expire_after` past its start"""
+        expires = countdown.event_utc + self.expire_after
+        await self.clock.sleep(max(0.0, (expires - self.clock.now()).total_seconds()))
+        del self._countdowns[countdown.event_utc]
+        for channel_id, message_id in countdown.messages.items():
+            self._expired.setdefault(channel_id, []).append(message_id)
+        if self._expired and self._reaper is None:
+            self._reaper = self._spawn(self._reap())
+
+    async def _reap(self):
+        """Delete everything that expired during REAP_DELAY, in bulk where allowed"""
+        await self.clock.sleep(REAP_DELAY)
+        self._reaper = None
+        expired, self._expired = self._expired, {}
+        await self.broadcaster.delete(expired)
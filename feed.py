@@ -0,0 +1,139 @@
+"""
+iCalendar and JSON feeds of the upcoming events.
+
+Both feeds cover FEED_DAYS local days starting today and are rendered
+together, once per local day/UTC offset or when a reloaded schedule arrives
+through `replace_index()`. Each rendering gets an ETag (a hash of the body)
+and a Last-Modified time that only moves when the body actually changes, so
+calendar clients polling every few minutes are answered with a 304 from a
+dict lookup.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from clock import SYSTEM_CLOCK
+from schedule import INDEX, MANILA_TZ, format_12h
+
+FEED_DAYS = 14                       # local days covered, starting today
+EVENT_LENGTH = timedelta(minutes=10)  # calendar block shown per event start
+PRODID = '-//discord-bot//schedule feed//EN'
+
+# Content type of each feed
+FEED_TYPES = {'ics': 'text/calendar', 'json': 'application/json'}
+
+
+def _ics_text(value):
+    """Escape a TEXT value (RFC 5545 3.3.11)"""
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_fold(line):
+    """Fold a content line at 75 octets"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not parts else 74), len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1  # don't split a UTF-8 sequence
+        parts.append(data[start:end].decode('utf-8'))
+        start = end
+    return '\r\n '.join(parts)
+
+
+class ScheduleFeed:
+    def __init__(self, tz, index=INDEX, clock=SYSTEM_CLOCK, days=FEED_DAYS):
+        """
+        tz: ZoneInfo the schedule tables are written in (Lisbon)
+        index: compiled ScheduleIndex
+        clock: source of "now"
+        """
+        self.tz = tz
+        self.index = index
+        self.clock = clock
+        self.days = days
+        self._scope = None
+        self._feeds = {}  # kind -> (body bytes, etag, last_modified)
+
+    def replace_index(self, index, added=(), removed=()):
+        """Switch to a recompiled schedule; the feeds are re-rendered on the next request"""
+        self.index = index
+        self._scope = None
+
+    def events(self, start_day):
+        """(event_utc, game, event, icon, leads, hour, minute) for FEED_DAYS local days from `start_day`"""
+        events = []
+        for offset in range(self.days):
+            day = start_day + timedelta(days=offset)
+            for minute_of_day, group in self.index.events[day.weekday()]:
+                hour, minute = divmod(minute_of_day, 60)
+                event_utc = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz).astimezone(timezone.utc)
+                by_event = {}
+                for reminder in group:
+                    by_event.setdefault((reminder.game, reminder.event, reminder.icon), []).append(reminder.lead)
+                for (game, event, icon), leads in by_event.items():
+                    events.append((event_utc, game, event, icon, sorted(leads, reverse=True), hour, minute))
+        return events
+
+    def get(self, kind, now=None):
+        """(body, etag, last_modified) of the 'ics' or 'json' feed, rendering both once per scope"""
+        local = (now or self.clock.now()).astimezone(self.tz)
+        scope = (local.date(), local.utcoffset())
+        if scope != self._scope:
+            self._render(local)
+            self._scope = scope
+        return self._feeds[kind]
+
+    def _render(self, local):
+        stamp = local.astimezone(timezone.utc).replace(microsecond=0)
+        events = self.events(local.date())
+        for kind, body in (('ics', self._render_ics(events, stamp)), ('json', self._render_json(events))):
+            etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            previous = self._feeds.get(kind)
+            last_modified = previous[2] if previous is not None and previous[1] == etag else stamp
+            self._feeds[kind] = (body, etag, last_modified)
+
+    def _render_json(self, events):
+        entries = []
+        for event_utc, game, event, icon, leads, hour, minute in events:
+            entries.append({
+                'game': game,
+                'event': event,
+                'icon': icon,
+                'start': event_utc.isoformat().replace('+00:00', 'Z'),
+                'lisbon': format_12h(hour, minute),
+                'manila': event_utc.astimezone(MANILA_TZ).strftime("%I:%M %p").lstrip('0'),
+                'reminders': leads,
+            })
+        start = events[0][0].isoformat().replace('+00:00', 'Z') if events else None
+        return json.dumps({'timezone': str(self.tz), 'from': start, 'events': entries},
+                          ensure_ascii=False).encode('utf-8')
+
+    def _render_ics(self, events, stamp):
+        # DTSTAMP follows the content, not the render time, so an unchanged feed keeps its ETag
+        dtstamp = f"{events[0][0]:%Y%m%dT%H%M%SZ}" if events else f"{stamp:%Y%m%dT%H%M%SZ}"
+        lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+                 'METHOD:PUBLISH', 'X-WR-CALNAME:Event schedule', 'REFRESH-INTERVAL;VALUE=DURATION:PT12H']
+        for event_utc, game, event, icon, leads, hour, minute in events:
+            slug = ''.join(ch for ch in f"{game}-{event}".lower() if ch.isalnum() or ch == '-')
+            summary = f"{icon} {event}".strip() + (f" ({game})" if game else '')
+            lines += ['BEGIN:VEVENT',
+                      f"UID:{event_utc:%Y%m%dT%H%MZ}-{slug}@discord-bot",
+                      f"DTSTAMP:{dtstamp}",
+                      f"DTSTART:{event_utc:%Y%m%dT%H%M%SZ}",
+                      f"DTEND:{event_utc + EVENT_LENGTH:%Y%m%dT%H%M%SZ}",
+                      f"SUMMARY:{_ics_text(summary)}"]
+            for lead in leads:
+                lines += ['BEGIN:VALARM', 'ACTION:DISPLAY', f"DESCRIPTION:{_ics_text(f'{event} in {lead}min')}",
+                          f"TRIGGER:-PT{lead}M", 'END:VALARM']
+            lines.append('END:VEVENT')
+        lines.append('END:VCALENDAR')
+        return ('\r\n'.join(_ics_fold(line) for line in lines) + '\r\n').encode('utf-8')
+
+
+def http_date(moment):
+    """RFC 7231 date for Last-Modified"""
+    return format_datetime(moment, usegmt=True)
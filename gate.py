@@ -0,0 +1,110 @@
+"""
+Request coalescing and cooldowns for read-only commands.
+
+When an event is close, many members ask for `!schedule` / `!times` at once
+and each reply costs Discord API calls. Identical commands in the same
+channel while one is running, or within COALESCE_WINDOW after it finished,
+are dropped: the reply already in the channel answers them too. On top of
+that, per-user and per-channel cooldowns cap how often anyone can trigger a
+reply. Dropped invocations raise `Suppressed` before the command body runs,
+which the bot's error handler swallows, and are counted in
+bot_commands_suppressed_total.
+
+Coalescing is keyed on (channel, command); the gated commands take no
+arguments, so identical requests are exactly the same command.
+"""
+import time
+
+from discord.ext import commands
+
+import metrics
+
+COALESCE_WINDOW = 3.0  # seconds an answer covers identical requests after it
+USER_COOLDOWN = 0.0    # seconds between gated commands from one user (0 = off)
+CHANNEL_COOLDOWN = 0.0 # seconds between gated replies in one channel (0 = off)
+PRUNE_SIZE = 1024      # forget stale entries once a table grows past this
+
+
+class Suppressed(commands.CommandError):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"suppressed ({reason}), retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CommandGate:
+    def __init__(self, window=COALESCE_WINDOW, user_cooldown=USER_COOLDOWN, channel_cooldown=CHANNEL_COOLDOWN,
+                 clock=time.monotonic):
+        self.window = window
+        self.user_cooldown = user_cooldown
+        self.channel_cooldown = channel_cooldown
+        self.clock = clock
+        self._running = set()  # (channel, command) being answered
+        self._answered = {}    # (channel, command) -> when the answer finished
+        self._users = {}       # user -> last gated command
+        self._channels = {}    # channel -> last gated command
+        self.suppressed = 0
+
+    def _prune(self, table, age, now):
+        if len(table) > PRUNE_SIZE:
+            for key in [key for key, at in table.items() if now - at > age]:
+                del table[key]
+
+    def _suppress(self, command, reason, retry_after):
+        self.suppressed += 1
+        metrics.COMMANDS_SUPPRESSED.inc(command=command, reason=reason)
+        raise Suppressed(reason, retry_after)
+
+    def admit(self, channel_id, user_id, command):
+        """Let a command run, or raise Suppressed"""
+        now = self.clock()
+        key = (channel_id, command)
+        if key in self._running:
+            self._suppress(command, 'coalesced', self.window)
+        answered = self._answered.get(key)
+        if answered is not None and now - answered < self.window:
+            self._suppress(command, 'coalesced', self.window - (now - answered))
+        last = self._users.get(user_id)
+        if last is not None and now - last < self.user_cooldown:
+            self._suppress(command, 'user_cooldown', self.user_cooldown - (now - last))
+        last = self._channels.get(channel_id)
+        if last is not None and now - last < self.channel_cooldown:
+            self._suppress(command, 'channel_cooldown', self.channel_cooldown - (now - last))
+        self._running.add(key)
+        self._users[user_id] = self._channels[channel_id] = now
+        self._prune(self._users, self.user_cooldown, now)
+        self._prune(self._channels, self.channel_cooldown, now)
+
+    def finished(self, channel_id, command):
+        """Call once an admitted command has replied (or failed)"""
+        key = (channel_id, command)
+        if key in self._running:
+            self._running.discard(key)
+            now = self.clock()
+            self._answered[key] = now
+            self._prune(self._answered, self.window, now)
+
+    def release(self, ctx):
+        """finished() for a context the hook admitted, a no-op for the rest"""
+        if getattr(ctx, 'gated', False):
+            self.finished(ctx.channel.id, ctx.command.qualified_name)
+
+    async def on_error(self, ctx, error):
+        """
+        Release a command that failed; returns True when `error` was a
+        Suppressed invocation, which is then answered (or dropped) here.
+        """
+        self.release(ctx)
+        if not isinstance(error, Suppressed):
+            return False
+        # Prefix commands are dropped silently; interactions must be answered
+        if ctx.interaction is not None:
+            await ctx.send(f"⏳ Answered just now, try again in {error.retry_after:.1f}s", ephemeral=True)
+        return True
+
+    def hook(self):
+        """Decorator gating a command; runs as its before_invoke hook, so help listings don't trip it"""
+        async def admit(ctx):
+            self.admit(ctx.channel.id, ctx.author.id, ctx.command.qualified_name)
+            ctx.gated = True
+        return commands.before_invoke(admit)
@@ -0,0 +1,154 @@
+"""
+Health and metrics HTTP endpoints, served from the bot's own event loop.
+
+/         plain "Bot is running!" for uptime pingers
+/health   200 once the process has booted and is scheduling reminders (or
+          standing by for the replica that is), whether or not the gateway
+          is up yet; the gateway state is in the body. This is the platform
+          probe, so it must not wait for the Discord login, but it turns 503
+          once the gateway has been down for longer than the grace period
+          (counted from boot if it never came up) so a wedged process is
+          restarted.
+/ready    200 only while the gateway is connected and ready, 503 otherwise
+/metrics  Prometheus text format
+/schedule.ics, /schedule.json
+          upcoming events as an iCalendar / JSON feed, with ETag and
+          Last-Modified so polling clients get 304s
+"""
+import logging
+import math
+import socket
+import time
+
+from aiohttp import web
+
+import metrics
+from feed import FEED_TYPES, http_date
+
+log = logging.getLogger('bot.health')
+
+FEED_MAX_AGE = 300  # seconds clients may reuse a feed without revalidating
+GATEWAY_GRACE = 300.0  # seconds the gateway may be down before /health fails
+
+
+def gateway_state(bot):
+    """(healthy, details) of the Discord gateway connection"""
+    latency = bot.latency
+    ready = bot.is_ready() and not bot.is_closed()
+    healthy = ready and math.isfinite(latency)
+    return healthy, {
+        'status': 'ok' if healthy else 'unavailable',
+        'ready': bot.is_ready(),
+        'closed': bot.is_closed(),
+        'latency_ms': round(latency * 1000, 1) if math.isfinite(latency) else None,
+    }
+
+
+class GatewayWatch:
+    """Remembers since when the gateway has been down: from boot until it first comes up"""
+
+    def __init__(self, bot, grace=GATEWAY_GRACE, clock=time.monotonic):
+        self.bot = bot
+        self.grace = grace
+        self.clock = clock
+        self.down_since = clock()
+
+    def check(self):
+        """gateway_state(), plus whether the gateway has been down past the grace period"""
+        healthy, details = gateway_state(self.bot)
+        now = self.clock()
+        if healthy:
+            self.down_since = None
+        elif self.down_since is None:
+            self.down_since = now
+        down = 0.0 if self.down_since is None else now - self.down_since
+        details['down_seconds'] = round(down, 1)
+        return healthy, down > self.grace, details
+
+
+def process_state(watch, reminders=None):
+    """
+    (healthy, details) of the process. watch: GatewayWatch of the bot;
+    reminders: callable returning 'running', 'standby' or 'starting'. Healthy
+    once it is past 'starting', until the gateway outlasts its grace period.
+    """
+    state = reminders() if reminders is not None else 'running'
+    _, overdue, gateway = watch.check()
+    if state == 'starting':
+        status = 'starting'
+    else:
+        status = 'gateway down' if overdue else 'ok'
+    return status == 'ok', {'status': status, 'reminders': state, 'gateway': gateway}
+
+
+def _not_modified(request, etag, last_modified):
+    """Whether the client's cached copy is current (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    since = request.if_modified_since
+    return since is not None and last_modified <= since
+
+
+def feed_handler(feed, kind):
+    async def handler(request):
+        body, etag, last_modified = feed.get(kind)
+        headers = {'ETag': etag, 'Last-Modified': http_date(last_modified),
+                   'Cache-Control': f'public, max-age={FEED_MAX_AGE}'}
+        if _not_modified(request, etag, last_modified):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, headers=headers, content_type=FEED_TYPES[kind], charset='utf-8')
+    return handler
+
+
+def create_app(bot, feed=None, reminders=None, grace=GATEWAY_GRACE):
+    watch = GatewayWatch(bot, grace)
+
+    async def index(request):
+        return web.Response(text='Bot is running!')
+
+    async def health(request):
+        healthy, details = process_state(watch, reminders)
+        return web.json_response(details, status=200 if healthy else 503)
+
+    async def ready(request):
+        healthy, _, details = watch.check()
+        return web.json_response(details, status=200 if healthy else 503)
+
+    async def show_metrics(request):
+        healthy, details = gateway_state(bot)
+        metrics.GATEWAY_CONNECTED.set(1 if healthy else 0)
+        if details['latency_ms'] is not None:
+            metrics.GATEWAY_LATENCY.set(details['latency_ms'] / 1000)
+        metrics.RESIDENT_MEMORY.set(metrics.resident_memory())
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_route('*', '/', index)
+    app.router.add_get('/health', health)
+    app.router.add_get('/ready', ready)
+    app.router.add_get('/metrics', show_metrics)
+    if feed is not None:
+        app.router.add_get('/schedule.ics', feed_handler(feed, 'ics'))
+        app.router.add_get('/schedule.json', feed_handler(feed, 'json'))
+    return app
+
+
+async def start_health_server(bot, port, feed=None, reminders=None, grace=GATEWAY_GRACE):
+    """
+    Serve the endpoints on the running loop; returns the runner for cleanup.
+    port: port number, or a listening socket bound earlier in startup
+    reminders: callable returning the reminder scheduler's state, for /health
+    grace: seconds the gateway may stay down (or not come up) before /health fails
+    """
+    runner = web.AppRunner(create_app(bot, feed, reminders, grace), access_log=None)
+    await runner.setup()
+    if isinstance(port, socket.socket):
+        site = web.SockSite(runner, port)
+        port = port.getsockname()[1]
+    else:
+        site = web.TCPSite(runner, '0.0.0.0', port)
+    await site.start()
+    log.info("Health server starting on port %d", port, extra={'port': port})
+    return runner
@@ -0,0 +1,69 @@
+"""
+Hot reload of the schedules file.
+
+The watcher polls the file's mtime; when it changes the file is parsed into a
+new ScheduleIndex (cheap: a few hundred reminders) and diffed against the
+running one, and every target gets `replace_index(index, added, removed)`.
+Targets patch their own state from the diff, so the scheduler keeps its
+pending fires for unchanged events and never stops its timer. A file that
+fails to parse is reported and the running schedule stays in place.
+"""
+import asyncio
+import logging
+import os
+
+from schedule import ScheduleIndex, load_reminders
+
+log = logging.getLogger('bot.hotreload')
+
+POLL_INTERVAL = 5.0  # seconds between mtime checks
+
+
+class ScheduleWatcher:
+    def __init__(self, path, index, targets, interval=POLL_INTERVAL):
+        """
+        path: schedules file to watch
+        index: ScheduleIndex currently loaded from it
+        targets: objects with replace_index(index, added, removed)
+        """
+        self.path = path
+        self.index = index
+        self.targets = list(targets)
+        self.interval = interval
+        self._mtime = self._stat()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    async def check(self):
+        """Reload if the file changed; returns (added, removed) reminders"""
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return (), ()
+        self._mtime = mtime
+        try:
+            # Reading and parsing the file happens off the loop
+            reminders = await asyncio.get_running_loop().run_in_executor(None, load_reminders, self.path)
+        except (OSError, ValueError) as e:
+            log.error("❌ Schedule reload failed, keeping the current schedule: %s", e, extra={'path': self.path})
+            return (), ()
+        old, new = set(self.index.reminders), set(reminders)
+        added = [r for r in reminders if r not in old]
+        removed = [r for r in self.index.reminders if r not in new]
+        if not added and not removed:
+            return (), ()
+        self.index = ScheduleIndex(reminders)
+        for target in self.targets:
+            target.replace_index(self.index, added, removed)
+        changed = sorted({r.event for r in added} | {r.event for r in removed})
+        log.info("🔄 Schedule reloaded: +%d -%d reminders (%s)", len(added), len(removed), ', '.join(changed),
+                 extra={'path': self.path})
+        return added, removed
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
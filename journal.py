@@ -0,0 +1,140 @@
+"""
+Append-only journal of delivered reminders.
+
+Each delivered reminder appends one line, "<unix time>\t<reminder id>", and
+so does each channel or subscriber it reached ("<reminder id>@<target>"), so
+a restarted or resumed process knows what already went out and neither
+re-sends it nor skips it. Lines are buffered and written + fsynced in
+batches by a background task (the fsync runs in an executor, off the event
+loop). Old entries are dropped when the journal is loaded.
+"""
+import asyncio
+import logging
+import os
+import time
+
+log = logging.getLogger('bot.journal')
+
+FLUSH_INTERVAL = 1.0     # seconds between batched fsyncs
+BATCH_SIZE = 32          # flush early once this many records are pending
+RETENTION = 2 * 86400    # seconds of history kept when compacting on load
+
+
+class DeliveryJournal:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, retention=RETENTION, compact=True):
+        """
+        compact: rewrite the file without old entries on load; replicas sharing
+                 the file leave that to whoever holds the leader lease (reload())
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self._pending = []
+        self._lock = asyncio.Lock()  # held while a batch is written or the file is swapped
+        self._wakeup = None
+        self._task = None
+        self._seen = self._load(compact)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self, compact=True):
+        """Read the journal, keeping only recent entries, and rewrite it compacted. Returns the ids read"""
+        seen = set()
+        if not os.path.exists(self.path):
+            return seen
+        cutoff = time.time() - self.retention
+        kept = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                stamp, _, reminder_id = line.rstrip('\n').partition('\t')
+                try:
+                    if float(stamp) >= cutoff and reminder_id:
+                        kept.append(line if line.endswith('\n') else line + '\n')
+                        seen.add(reminder_id)
+                except ValueError:
+                    continue  # torn write from a crash
+        if not compact:
+            return seen
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        return seen
+
+    async def reload(self):
+        """
+        Re-read the journal from disk, e.g. after taking over as leader from a
+        replica that shares the file, and reopen it for appending. Runs under the
+        write lock after flushing, so no batch is written while the file is
+        swapped; only the read and compaction run off the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            await self._flush_locked()
+            self._file.close()
+            try:
+                self._seen |= await loop.run_in_executor(None, self._load)
+            finally:
+                self._file = open(self.path, 'a', encoding='utf-8')
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self._seen
+
+    def __len__(self):
+        return len(self._seen)
+
+    def record(self, reminder_id):
+        """Mark a reminder delivered; it reaches disk with the next batch"""
+        if reminder_id in self._seen:
+            return
+        self._seen.add(reminder_id)
+        self._pending.append(f"{time.time():.0f}\t{reminder_id}\n")
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write(self, lines):
+        self._file.writelines(lines)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        if self._pending:
+            lines, self._pending = self._pending, []
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+            except BaseException:
+                self._pending[:0] = lines  # keep them for the next batch
+                raise
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except (OSError, ValueError) as e:
+                log.error("❌ Journal write failed: %s", e, extra={'path': self.path})
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    def close(self):
+        """Write whatever is pending synchronously and close the file"""
+        if self._task is not None:
+            self._task.cancel()
+        if self._pending:
+            self._write(self._pending)
+            self._pending = []
+        self._file.close()
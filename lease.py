@@ -0,0 +1,94 @@
+"""
+Leader election over a local SQLite lease.
+
+Processes that would deliver the same reminders (replicas of one shard
+range, or of the whole bot) share a lease row named after what they own.
+Whoever holds an unexpired lease is the leader and runs the reminder
+scheduler; it renews every `renew` seconds. If it dies, the lease expires
+after `ttl` seconds and the next replica to try takes over, so failover
+takes at most ttl + renew. A leader that shuts down cleanly releases the
+lease so a replica takes over on its next attempt.
+
+The SQLite calls run in an executor; they are tiny, but the file may sit on
+a slow disk.
+"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+log = logging.getLogger('bot.lease')
+
+LEASE_TTL = 10.0   # seconds a lease stays valid without renewal
+LEASE_RENEW = 3.0  # seconds between renewal / takeover attempts
+
+
+class LeaderLease:
+    def __init__(self, path, name, ttl=LEASE_TTL, renew=LEASE_RENEW, holder=None):
+        """
+        path: SQLite file shared by the competing processes
+        name: what the leader owns, e.g. 'reminders:0_1of4'
+        holder: identity of this process (defaults to host:pid)
+        """
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.renew = renew
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=self.renew, isolation_level=None, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, '
+                             'expires REAL NOT NULL)')
+        return self._db
+
+    def try_acquire(self):
+        """Take or renew the lease; returns whether this process holds it"""
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT holder, expires FROM leases WHERE name = ?', (self.name,)).fetchone()
+            if row is None or row[0] == self.holder or row[1] < now:
+                db.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)', (self.name, self.holder, now + self.ttl))
+                held = True
+            else:
+                held = False
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return held
+
+    def release(self):
+        """Give the lease up (on clean shutdown) so a replica takes over at once"""
+        if self.leader:
+            self.leader = False
+            self._connect().execute('DELETE FROM leases WHERE name = ? AND holder = ?', (self.name, self.holder))
+
+    async def run(self, on_elected, on_demoted):
+        """
+        Keep competing for the lease, calling on_elected() when this process
+        becomes leader and on_demoted() when it stops being one.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                held = await loop.run_in_executor(None, self.try_acquire)
+            except sqlite3.Error as e:
+                log.error("❌ Lease %s: %s", self.name, e)
+                held = False
+            if held and not self.leader:
+                self.leader = True
+                log.info("👑 Elected leader for %s", self.name, extra={'holder': self.holder})
+                await on_elected()
+            elif not held and self.leader:
+                self.leader = False
+                log.warning("Lost the lease for %s", self.name, extra={'holder': self.holder})
+                await on_demoted()
+            await asyncio.sleep(self.renew)
@@ -0,0 +1,81 @@
+"""
+Bot lifecycle: first boot vs. reconnects.
+
+discord.py calls on_ready again after every full reconnect, so anything that
+should happen once per process (starting the scheduler, the online
+announcement) goes through `boot()`/`first_ready`, while reconnects only
+record how long the bot was away. Boot work runs before logging in, because
+the health port and reminders only need the loop and REST; each startup
+stage (imports, health, reminders, boot, ready) is exported as
+bot_startup_seconds{stage} so cold boots can be compared.
+"""
+import asyncio
+import logging
+import time
+
+import metrics
+
+log = logging.getLogger('bot.lifecycle')
+
+
+class Lifecycle:
+    def __init__(self, on_boot, on_first_ready=None, started=None):
+        """
+        on_boot: coroutine run once, before logging in
+        on_first_ready: coroutine run in the background on the first on_ready only
+        started: time.monotonic() of process start (defaults to now)
+        """
+        self.on_boot = on_boot
+        self.on_first_ready = on_first_ready
+        self.booted = False
+        self.ready_count = 0
+        self._started = started if started is not None else time.monotonic()
+        self._disconnected_at = None
+        self._background = set()
+
+    async def boot(self):
+        if self.booted:
+            return
+        self.booted = True
+        await self.on_boot()
+        self.mark('boot')
+
+    def mark(self, stage):
+        """Record that startup reached `stage`; returns the seconds since process start"""
+        elapsed = time.monotonic() - self._started
+        metrics.STARTUP_SECONDS.set(elapsed, stage=stage)
+        return elapsed
+
+    def ready(self):
+        """Call from on_ready; returns True on the first ready of the process"""
+        first = self.ready_count == 0
+        self.ready_count += 1
+        if first:
+            self.mark('ready')
+            if self.on_first_ready is not None:
+                self.spawn(self.on_first_ready())
+        else:
+            self._reconnected('ready')
+        return first
+
+    def resumed(self):
+        """Call from on_resumed (session resumed without a new on_ready)"""
+        self._reconnected('resume')
+
+    def disconnected(self):
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+
+    def _reconnected(self, kind):
+        if self._disconnected_at is not None:
+            away = time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            metrics.RECONNECT_LATENCY.observe(away, kind=kind)
+            log.info("🔌 Reconnected (%s) after %.1fs", kind, away, extra={'kind': kind, 'latency': round(away, 3)})
+
+    def spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference until it finishes"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
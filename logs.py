@@ -0,0 +1,104 @@
+"""
+Structured logging that never blocks the event loop.
+
+Modules log through `logging.getLogger('bot.<module>')`. setup_logging()
+puts a QueueHandler on the root logger, so a log call on the loop only
+formats the message and enqueues the record; a QueueListener thread turns
+records into JSON lines and does the (possibly slow, piped) stdout write.
+discord.py's own loggers go through the same queue.
+
+Extra fields passed with `extra=` (event_id, fire_time, latency, channel, ...)
+become top-level JSON keys. Records from noisy paths, such as per-channel
+send failures during a broadcast, pass `extra={'sample': key}`: only the
+first SAMPLE_BURST of them per key every SAMPLE_WINDOW seconds get through,
+and the next one that does carries a `dropped` count.
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+SAMPLE_BURST = 5      # sampled records let through per key and window
+SAMPLE_WINDOW = 10.0  # seconds
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD and key != 'sample':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Rate-limit records tagged with `sample`, per tag"""
+
+    def __init__(self, burst=SAMPLE_BURST, window=SAMPLE_WINDOW, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.clock = clock
+        self._windows = {}  # tag -> [window start, let through, dropped]
+
+    def filter(self, record):
+        tag = getattr(record, 'sample', None)
+        if tag is None:
+            return True
+        now = self.clock()
+        state = self._windows.get(tag)
+        if state is None or now - state[0] >= self.window:
+            dropped = state[2] if state is not None else 0
+            state = self._windows[tag] = [now, 0, dropped]
+        if state[1] >= self.burst:
+            state[2] += 1
+            return False
+        state[1] += 1
+        if state[2]:
+            record.dropped = state[2]
+            state[2] = 0
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """Freeze the message and traceback into the record; formatting happens in the writer"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level='INFO', stream=None):
+    """Route all logging through a background writer; returns the listener to stop() at exit"""
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SampleFilter())
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+    logging.getLogger('bot').setLevel(level.upper() if isinstance(level, str) else level)
+    listener.start()
+    return listener
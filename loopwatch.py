@@ -0,0 +1,96 @@
+"""
+Event loop watchdog.
+
+A task on the loop records a heartbeat every `interval` and the lateness of
+each wakeup (bot_event_loop_lag_seconds). A daemon thread watches the
+heartbeat; once it is more than `threshold` overdue the loop is stuck in
+some callback, so the thread grabs the loop thread's current stack and logs
+it, then logs the stall's total length when the loop comes back. The
+stack is taken while the stall is still in progress, so it points at the
+blocking code itself rather than whatever runs after it.
+
+`cpu_timer(handler)` measures the CPU a synchronous section spends on the
+loop thread, for the per-handler bot_handler_cpu_seconds histogram.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import metrics
+
+log = logging.getLogger('bot.watchdog')
+
+LAG_INTERVAL = 0.1     # seconds between loop heartbeats
+STALL_THRESHOLD = 0.1  # seconds overdue before the loop counts as stalled
+
+
+@contextmanager
+def cpu_timer(handler):
+    """Record the loop-thread CPU time of the enclosed (synchronous) block"""
+    started = time.thread_time()
+    try:
+        yield
+    finally:
+        metrics.HANDLER_CPU.observe(time.thread_time() - started, handler=handler)
+
+
+class LoopWatchdog:
+    def __init__(self, interval=LAG_INTERVAL, threshold=STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        self._beat = None
+        self._loop_thread = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            self._beat = started
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            metrics.LOOP_LAG.observe(max(0.0, now - started - self.interval))
+
+    def _stack(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        return ''.join(traceback.format_stack(frame)) if frame is not None else ''
+
+    def _watch(self):
+        stalled_since = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._beat
+            if beat is None:
+                continue
+            overdue = time.monotonic() - beat - self.interval
+            if stalled_since is None and overdue > self.threshold:
+                stalled_since = beat + self.interval
+                self.stalls += 1
+                metrics.LOOP_STALLS.inc()
+                log.warning("🐢 Event loop blocked for %.0fms so far", overdue * 1000,
+                            extra={'latency': round(overdue, 3), 'stack': self._stack()})
+            elif stalled_since is not None and overdue <= self.threshold:
+                stalled = beat - stalled_since
+                stalled_since = None
+                log.warning("🐢 Event loop was blocked for %.0fms", stalled * 1000, extra={'latency': round(stalled, 3)})
+
+    def start(self):
+        """Start the heartbeat on the running loop and the watching thread"""
+        if self._task is None or self._task.done():
+            self._loop_thread = threading.get_ident()
+            self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._thread.start()
+        return self._task
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
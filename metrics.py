@@ -0,0 +1,135 @@
+"""
+Tiny in-process metrics registry rendered in the Prometheus text format.
+
+Only what the bot needs: counters, gauges and fixed-bucket histograms,
+optionally split by label values.
+"""
+import os
+import resource
+from bisect import bisect_left
+
+REGISTRY = []
+
+CPU_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self):
+        if not self.values and not self.label_names:
+            return [f"{self.name} 0"]
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.values = {}
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self.values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label key -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _samples(self):
+        lines = []
+        names = self.label_names + ('le',)
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            base = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{base} {series[-1]}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+def resident_memory():
+    """Current resident set size in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics shared across modules
+LOOP_LAG = Histogram('bot_event_loop_lag_seconds', 'Event loop scheduling lag')
+REMINDER_LATENCY = Histogram('bot_reminder_delivery_seconds', 'Reminder fire instant to channel delivery')
+RATE_LIMITED = Counter('bot_discord_rate_limited_total', 'Discord 429 responses', labels=('scope',))
+COMMAND_LATENCY = Histogram('bot_command_duration_seconds', 'Command handler duration', labels=('command',))
+GATEWAY_CONNECTED = Gauge('bot_gateway_connected', 'Whether the Discord gateway is connected and ready')
+GATEWAY_LATENCY = Gauge('bot_gateway_latency_seconds', 'Discord gateway heartbeat latency')
+GATEWAY_EVENTS = Counter('bot_gateway_events_total', 'Gateway dispatch events received', labels=('type',))
+RESIDENT_MEMORY = Gauge('bot_resident_memory_bytes', 'Resident memory of the bot process')
+STARTUP_SECONDS = Gauge('bot_startup_seconds', 'Process start to each startup stage (imports, health, reminders, boot, ready)', labels=('stage',))
+RECONNECT_LATENCY = Histogram('bot_reconnect_seconds', 'Gateway disconnect to resumed/ready', labels=('kind',))
+COMMANDS_SUPPRESSED = Counter('bot_commands_suppressed_total', 'Commands dropped by coalescing or cooldowns', labels=('command', 'reason'))
+LOOP_STALLS = Counter('bot_event_loop_stalls_total', 'Times the event loop was blocked past the watchdog threshold')
+HANDLER_CPU = Histogram('bot_handler_cpu_seconds', 'CPU time spent on the loop thread per handler call',
+                        labels=('handler',), buckets=CPU_BUCKETS)
+REMINDER_WAKE_LAG = Histogram('bot_reminder_wake_lag_seconds', 'How late the scheduler woke for a fire instant',
+                              buckets=CPU_BUCKETS)
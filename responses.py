@@ -0,0 +1,178 @@
+"""
+Rendered command replies, cached per local day.
+
+Everything `!times`, `!worldboss`, `!schedule` and `!debug` print is a pure
+function of the compiled schedule and the current local date (plus, for the
+status lines, the current minute). Replies are memoized under keys scoped to
+the local date and UTC offset, so the whole cache drops automatically at
+local midnight and at a DST transition; in between a reply is a dict lookup.
+A reloaded schedule (`replace_index()`) drops it too.
+"""
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from clock import SYSTEM_CLOCK
+from schedule import INDEX, MANILA_TZ, MINUTES_PER_WEEK, format_12h, minute_of_week
+
+
+def clock_12h(moment):
+    """'2:00 AM' style time of an aware datetime"""
+    return moment.strftime("%I:%M %p").lstrip('0')
+
+
+class ScheduleResponses:
+    def __init__(self, tz, index=INDEX, clock=SYSTEM_CLOCK):
+        """
+        tz: ZoneInfo the schedule tables are written in (Lisbon)
+        index: compiled ScheduleIndex
+        clock: source of "now" when a call doesn't pass one
+        """
+        self.tz = tz
+        self.index = index
+        self.clock = clock
+        self._scope = None
+        self._entries = {}
+
+    def replace_index(self, index, added=(), removed=()):
+        """Switch to a recompiled schedule and forget every cached reply"""
+        self.index = index
+        self._scope = None
+        self._entries = {}
+
+    def _local(self, now):
+        if now is None:
+            now = self.clock.now()
+        return now.astimezone(self.tz)
+
+    def _cached(self, key, local, build):
+        """Return the cached value for key, building it once per local day/offset"""
+        scope = (local.date(), local.utcoffset())
+        if scope != self._scope:
+            self._scope = scope
+            self._entries = {}
+        value = self._entries.get(key)
+        if value is None:
+            value = self._entries[key] = build()
+        return value
+
+    def _event_manila(self, day, hour, minute):
+        """Manila clock time of a schedule wall time on `day`"""
+        local = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz)
+        return clock_12h(local.astimezone(MANILA_TZ))
+
+    def nation_war_status(self, now=None):
+        """("Nation War", event time) if a 5-minute warning fires this minute, else (None, current time)"""
+        local = self._local(now)
+        for reminder in self.index.due(minute_of_week(local)):
+            if reminder.event == 'Nation War' and reminder.lead == self._first_lead('Nation War'):
+                return "Nation War", format_12h(reminder.hour, reminder.minute)
+        return None, local.strftime("%I:%M %p")
+
+    def world_boss_status(self, now=None):
+        """("World Boss", event time, minute) if a warning fires this minute, else (None, current time, None)"""
+        local = self._local(now)
+        for reminder in self.index.due(minute_of_week(local)):
+            if reminder.event == 'World Boss':
+                return "World Boss", format_12h(reminder.hour, reminder.minute), local.minute
+        return None, local.strftime("%I:%M %p"), None
+
+    def times(self, now=None):
+        """!times: every event in Lisbon and Manila time"""
+        local = self._local(now)
+        return self._cached('times', local, lambda: self._render_times(local.date()))
+
+    def _render_times(self, day):
+        sections = []
+        for event in self.index.event_names():
+            lines = [f"{self.index.icon(event)} {event} Events:"]
+            for hour, minute in self.index.event_times(event):
+                lines.append(f"Lisbon: {format_12h(hour, minute)} → Manila: {self._event_manila(day, hour, minute)}")
+            sections.append('\n'.join(lines) + '\n')
+        return "🌍 Complete Event Schedule:\n\n" + '\n'.join(sections)
+
+    def worldboss(self, now=None):
+        """!worldboss: World Boss events grouped by hour"""
+        local = self._local(now)
+        return self._cached('worldboss', local, lambda: self._render_worldboss(local.date()))
+
+    def _render_worldboss(self, day):
+        schedule_text = "🐲 World Boss Schedule:\n\n"
+        for hour, times in groupby(self.index.event_times('World Boss'), key=lambda t: t[0]):
+            minutes = [minute for _, minute in times]
+            time_list = [format_12h(hour, minute) for minute in minutes]
+            manila_time_list = [self._event_manila(day, hour, minute) for minute in minutes]
+            schedule_text += f"Lisbon: {' & '.join(time_list)} → Manila: {' & '.join(manila_time_list)}\n"
+        return schedule_text
+
+    def schedule(self, now=None):
+        """!schedule: list of messages (status for this minute, then the reminder times)"""
+        local = self._local(now)
+        status = self._cached(('schedule', local.hour, local.minute), local, lambda: self._render_status(local))
+        reminders = self._cached('schedule', local, self._render_reminder_times)
+        return [status, reminders]
+
+    def _render_status(self, local):
+        nation_war_event, nation_war_time = self.nation_war_status(local)
+        world_boss_event, world_boss_time, _ = self.world_boss_status(local)
+        if nation_war_event or world_boss_event:
+            schedule_text = "📅 Upcoming Events:\n"
+            if nation_war_event:
+                schedule_text += f"⚔️ {nation_war_event} at {nation_war_time} (Lisbon time)\n"
+            if world_boss_event:
+                schedule_text += f"🐲 {world_boss_event} at {world_boss_time} (Lisbon time)\n"
+            return schedule_text
+        return (f"📅 No events scheduled right now.\n"
+                f"Current time (Lisbon): {local.strftime('%I:%M %p')}\n"
+                f"Current time (Manila): {local.astimezone(MANILA_TZ).strftime('%I:%M %p')}")
+
+    def _render_reminder_times(self):
+        reminder_times = [format_12h(hour, minute) for hour, minute in self.index.reminder_times('Nation War', self._first_lead('Nation War'))]
+        return f"⚔️ Nation War reminders (Lisbon time): {', '.join(reminder_times)}"
+
+    def _first_lead(self, event):
+        leads = self.index.leads(event)
+        return leads[0] if leads else None
+
+    def debug(self, now=None):
+        """!debug: list of messages describing the clock and the next reminders"""
+        local = self._local(now)
+        return self._cached(('debug', local.hour, local.minute), local, lambda: self._render_debug(local))
+
+    def _render_debug(self, local):
+        local = local.replace(second=0, microsecond=0)
+        utc_now = local.astimezone(timezone.utc)
+        manila_now = local.astimezone(MANILA_TZ)
+        current_hour = local.hour
+        current_minute = local.minute
+
+        # Reminder hours/minutes straight from the compiled schedule
+        nation_war_fires = [t for lead in self.index.leads('Nation War') for t in self.index.reminder_times('Nation War', lead)]
+        world_boss_fires = [t for lead in self.index.leads('World Boss') for t in self.index.reminder_times('World Boss', lead)]
+        nation_war_minutes = sorted({minute for _, minute in nation_war_fires})
+        world_boss_minutes = sorted({minute for _, minute in world_boss_fires})
+
+        info = (f"🐛 Debug Info:\n"
+                f"Current time (Lisbon): {local.strftime('%H:%M')} (24h) / {local.strftime('%I:%M %p')} (12h)\n"
+                f"Current time (Manila): {manila_now.strftime('%H:%M')} (24h) / {manila_now.strftime('%I:%M %p')} (12h)\n"
+                f"UTC time: {utc_now.strftime('%H:%M')} (24h) / {utc_now.strftime('%I:%M %p')} (12h)\n"
+                f"Hour: {current_hour}, Minute: {current_minute}\n"
+                f"Nation War reminder hour: {current_hour in {hour for hour, _ in nation_war_fires}}\n"
+                f"Is minute {'/'.join(f'{m:02d}' for m in nation_war_minutes)}: {current_minute in nation_war_minutes}\n"
+                f"World Boss warning hour: {current_hour in {hour for hour, _ in world_boss_fires}}\n"
+                f"Is minute {'/'.join(f'{m:02d}' for m in world_boss_minutes)}: {current_minute in world_boss_minutes}")
+
+        # Check for events whose reminders fire within the next hour
+        events_info = ""
+        now_minute = minute_of_week(local)
+        for position, event in enumerate(self.index.event_names()):
+            icon = self.index.icon(event)
+            separator = "\n\n" if position < len(self.index.event_names()) - 1 else ""
+            fire_minute, group = self.index.next_after(now_minute, event)
+            ahead = (fire_minute - now_minute) % MINUTES_PER_WEEK if group else None
+            if group and ahead < 60:
+                reminder = group[0]
+                manila_event = (utc_now + timedelta(minutes=ahead + reminder.lead)).astimezone(MANILA_TZ)
+                events_info += (f"{icon} Next {event}:\nLisbon: {format_12h(reminder.hour, reminder.minute)}\n"
+                                f"Manila: {clock_12h(manila_event)}{separator}")
+
+        return [info, events_info or "No immediate events scheduled."]
@@ -0,0 +1,240 @@
+"""
+Event reminder tables, loaded from the schedules file, and the timeline of
+absolute fire instants built from them.
+
+All table times are wall-clock times in the schedule timezone (Lisbon).
+"""
+import json
+import os
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+MANILA_TZ = ZoneInfo('Asia/Manila')
+
+SCHEDULE_FILE = os.getenv('SCHEDULE_FILE') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedules.json')
+
+DEFAULT_TEMPLATE = "{icon} {event} in {lead}min at {time} Lisbon / {manila} Manila! {icon}"
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# One reminder: `lead` minutes before `event` at hour:minute local time
+Reminder = namedtuple('Reminder', ['event', 'hour', 'minute', 'lead', 'game', 'icon', 'template'],
+                      defaults=('', '', DEFAULT_TEMPLATE))
+
+
+def _parse_time(value):
+    hour, _, minute = str(value).partition(':')
+    hour, minute = int(hour), int(minute or 0)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"time out of range: {value!r}")
+    return hour, minute
+
+
+def _check_template(text):
+    try:
+        text.format(icon='', event='', game='', lead=0, time='', manila='')
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"bad template {text!r}: {e!r}") from None
+
+
+def build_reminders(definitions):
+    """
+    Expand schedule definitions into one Reminder per warning.
+
+    definitions: {"games": [{"name", "events": [{"name", "icon", "times": ["HH:MM", ...],
+    "leads": [minutes, ...], "templates": {"<lead>": "..."}}]}]}
+    Raises ValueError when a definition is malformed.
+    """
+    reminders = []
+    try:
+        for game in definitions['games']:
+            for event in game['events']:
+                templates = {int(lead): text for lead, text in event.get('templates', {}).items()}
+                for text in templates.values():
+                    _check_template(text)
+                for value in event['times']:
+                    hour, minute = _parse_time(value)
+                    for lead in event['leads']:
+                        lead = int(lead)
+                        if not 0 < lead < MINUTES_PER_DAY:
+                            raise ValueError(f"{event['name']}: lead out of range: {lead}")
+                        reminders.append(Reminder(event['name'], hour, minute, lead, game.get('name', ''),
+                                                  event.get('icon', ''), templates.get(lead, DEFAULT_TEMPLATE)))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"malformed schedule definition: {e!r}") from None
+    return reminders
+
+
+def load_reminders(path=SCHEDULE_FILE):
+    """Read a JSON (or, with PyYAML installed, YAML) schedules file into Reminders"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml  # optional, and slow to import, so only for YAML schedules
+        except ImportError:
+            raise ValueError(f"{path}: PyYAML is not installed") from None
+        try:
+            definitions = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"{path}: {e}") from None
+    else:
+        try:
+            definitions = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    return build_reminders(definitions)
+
+
+REMINDERS = load_reminders()
+
+
+def fire_minute(reminder):
+    """Local minute-of-day at which the reminder fires"""
+    return (reminder.hour * 60 + reminder.minute - reminder.lead) % MINUTES_PER_DAY
+
+
+def minute_of_week(local):
+    """Minute-of-week (Monday 00:00 = 0) of a local datetime"""
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+class ScheduleIndex:
+    """
+    Reminders compiled into a minute-of-week lookup table.
+
+    `due()` is a single array lookup and `next_after()` a bisect over the
+    sorted fire minutes, so the number of event types costs nothing per tick.
+    """
+
+    def __init__(self, reminders):
+        self.reminders = tuple(reminders)
+        by_minute = {}
+        for reminder in self.reminders:
+            minute = fire_minute(reminder)
+            for day in range(7):
+                by_minute.setdefault(day * MINUTES_PER_DAY + minute, []).append(reminder)
+        self.fire_minutes = array('H', sorted(by_minute))
+        self.groups = [tuple(by_minute[minute]) for minute in self.fire_minutes]
+        # weekday -> [(event minute-of-day, reminders)], for building timelines
+        self.events = [[] for _ in range(7)]
+        by_event = {}
+        for reminder in self.reminders:
+            by_event.setdefault(reminder.hour * 60 + reminder.minute, []).append(reminder)
+        for day in range(7):
+            self.events[day] = [(minute, tuple(by_event[minute])) for minute in sorted(by_event)]
+        # minute-of-week -> position in fire_minutes, -1 when nothing fires
+        self._slot = array('h', [-1]) * MINUTES_PER_WEEK
+        for position, minute in enumerate(self.fire_minutes):
+            self._slot[minute] = position
+
+    def due(self, minute):
+        """Reminders firing at this minute-of-week"""
+        position = self._slot[minute]
+        return self.groups[position] if position >= 0 else ()
+
+    def next_after(self, minute, event=None):
+        """(minute-of-week, reminders) of the first fire at or after `minute`, wrapping the week"""
+        start = bisect_left(self.fire_minutes, minute)
+        count = len(self.fire_minutes)
+        for offset in range(count):
+            position = (start + offset) % count
+            group = self.groups[position]
+            if event is not None:
+                group = tuple(r for r in group if r.event == event)
+            if group:
+                return self.fire_minutes[position], group
+        return None, ()
+
+    def event_names(self):
+        """Event types in schedule-file order"""
+        return list(dict.fromkeys(r.event for r in self.reminders))
+
+    def game_events(self):
+        """(game, event) pairs in schedule-file order"""
+        return list(dict.fromkeys((r.game, r.event) for r in self.reminders))
+
+    def icon(self, event):
+        return next((r.icon for r in self.reminders if r.event == event), '')
+
+    def leads(self, event):
+        """Distinct warning leads of an event type, earliest warning first"""
+        return sorted({r.lead for r in self.reminders if r.event == event}, reverse=True)
+
+    def next_lead(self, reminder):
+        """Lead of the warning after `reminder` for the same event start, 0 when it is the last"""
+        start = (reminder.game, reminder.event, reminder.hour, reminder.minute)
+        return max((r.lead for r in self.reminders
+                    if r.lead < reminder.lead and (r.game, r.event, r.hour, r.minute) == start), default=0)
+
+    def event_times(self, event):
+        """Sorted distinct (hour, minute) start times of an event type"""
+        return sorted({(r.hour, r.minute) for r in self.reminders if r.event == event})
+
+    def reminder_times(self, event, lead):
+        """Sorted distinct (hour, minute) fire times of one warning of an event type"""
+        return sorted({divmod(fire_minute(r), 60) for r in self.reminders
+                       if r.event == event and r.lead == lead})
+
+
+def format_12h(hour, minute):
+    """Format a wall-clock time as e.g. '2:00 AM' / '4:10 PM'"""
+    if hour == 0:
+        return f"12:{minute:02d} AM"
+    elif hour < 12:
+        return f"{hour}:{minute:02d} AM"
+    elif hour == 12:
+        return f"12:{minute:02d} PM"
+    return f"{hour-12}:{minute:02d} PM"
+
+
+def fire_times_for_day(index, tz, day, only=None):
+    """
+    Return sorted (fire_utc, reminders) pairs for the events on local date `day`,
+    restricted to the reminders in `only` when given.
+
+    Reminders fire `lead` minutes before the event's absolute start, so across
+    a DST change they still land 5/1/2 minutes ahead. Event wall times repeated
+    when the clock falls back mean their first pass; wall times skipped in
+    spring resolve to the same instant as if the clock had not jumped (PEP 495).
+    Fires for events just after midnight may fall on the previous local day.
+    """
+    by_fire = {}
+    for minute, group in index.events[day.weekday()]:
+        hour, minute = divmod(minute, 60)
+        event_utc = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz).astimezone(timezone.utc)
+        for reminder in group:
+            if only is not None and reminder not in only:
+                continue
+            by_fire.setdefault(event_utc - timedelta(minutes=reminder.lead), []).append(reminder)
+    return [(fire_utc, tuple(by_fire[fire_utc])) for fire_utc in sorted(by_fire)]
+
+
+def reminder_id(reminder, event_utc):
+    """Stable identity of one reminder occurrence, e.g. '20261017T0100Z:Cabal:Nation War:5'"""
+    return f"{event_utc:%Y%m%dT%H%MZ}:{reminder.game}:{reminder.event}:{reminder.lead}"
+
+
+def delivery_id(reminder_key, target):
+    """Identity of one reminder occurrence reaching one channel or "user:<id>", e.g. '<reminder id>@1234'"""
+    return f"{reminder_key}@{target}"
+
+
+def reminder_message(reminder, event_utc, template=None):
+    """Channel message for a reminder whose event starts at `event_utc`, from its template"""
+    return (template or reminder.template).format(
+        icon=reminder.icon,
+        event=reminder.event,
+        game=reminder.game,
+        lead=reminder.lead,
+        time=format_12h(reminder.hour, reminder.minute),
+        manila=event_utc.astimezone(MANILA_TZ).strftime("%I:%M %p").lstrip('0'),
+    )
+
+
+# Compiled once at import; commands and the scheduler all read from this
+INDEX = ScheduleIndex(REMINDERS)
@@ -0,0 +1,190 @@
+"""
+Next-fire reminder scheduler.
+
+Instead of waking every minute to compare the clock against the tables, the
+reminder tables are turned into absolute UTC fire instants, kept in a heap,
+and the task sleeps until exactly the next one. The timeline is extended one
+local day at a time, so DST changes are picked up when the day rolls over.
+
+With a DeliveryJournal attached, delivered reminders are recorded so a
+restart or reconnect neither repeats nor silently drops them: anything that
+came due while the process was down or stalled is still sent if its event
+has not started and it is less than CATCH_UP_GRACE late, and a failed
+delivery is retried on the same terms, until the event's next warning takes
+over (deadline()). The callback journals the channels a partial delivery
+did reach, so a retry only goes to the rest.
+
+Each fire instant is delivered in a background task, so a slow fan-out
+(a channel retrying 429s) never holds up the timer or the fires after it.
+
+`replace_index()` swaps in a recompiled schedule without restarting: only
+the fires of removed reminders are dropped from the heap and only added
+reminders are expanded onto the days already built, then the sleeper is
+woken in case the next fire moved earlier.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import timedelta
+
+import metrics
+from clock import SYSTEM_CLOCK
+from loopwatch import cpu_timer
+from schedule import fire_times_for_day, reminder_id
+
+log = logging.getLogger('bot.scheduler')
+
+# Woken this early (clock drift / sleep granularity) we go back to sleep
+EARLY_WAKE_TOLERANCE = 0.05
+
+CATCH_UP_GRACE = timedelta(minutes=5)  # how late a reminder may still go out
+RETRY_DELAY = timedelta(seconds=10)    # wait before retrying a failed delivery
+
+
+class ReminderScheduler:
+    def __init__(self, index, tz, callback, clock=SYSTEM_CLOCK, journal=None, grace=CATCH_UP_GRACE):
+        """
+        index: ScheduleIndex of the reminders to fire
+        tz: ZoneInfo the reminder tables are written in
+        callback: coroutine called as callback(reminder, event_utc) at fire time;
+                  returning False marks the delivery failed (it is retried)
+        clock: source of "now" and sleeps (SimulatedClock in replays)
+        journal: DeliveryJournal of reminders already delivered, or None
+        grace: how late a missed reminder may still be caught up
+        """
+        self.index = index
+        self.tz = tz
+        self.callback = callback
+        self.clock = clock
+        self.journal = journal
+        self.grace = grace
+        self._heap = []
+        self._seq = 0
+        self._built_through = None  # last local date pushed onto the heap
+        self._task = None
+        self._sleeper = None
+        self._deliveries = set()
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            # (Re)build the timeline from now, so a restart after stop() catches up like a fresh boot
+            self._heap = []
+            self._built_through = None
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    def stop(self):
+        if self.running:
+            self._task.cancel()
+        for delivery in self._deliveries:
+            delivery.cancel()
+
+    def now(self):
+        return self.clock.now()
+
+    def _push(self, due_utc, fire_utc, group):
+        heapq.heappush(self._heap, (due_utc, self._seq, fire_utc, group))
+        self._seq += 1
+
+    def _push_day(self, day, not_before):
+        for fire_utc, group in fire_times_for_day(self.index, self.tz, day):
+            if fire_utc >= not_before:
+                self._push(fire_utc, fire_utc, group)
+
+    def _extend(self, now):
+        """Make sure the heap covers today and tomorrow (local time)"""
+        today = now.astimezone(self.tz).date()
+        if self._built_through is None:
+            self._built_through = today - timedelta(days=1)
+        while self._built_through < today + timedelta(days=1):
+            self._built_through += timedelta(days=1)
+            self._push_day(self._built_through, now - self.grace)
+
+    def replace_index(self, index, added=(), removed=()):
+        """Switch to a recompiled index, patching the pending fires in place"""
+        self.index = index
+        if removed:
+            removed = set(removed)
+            heap = []
+            for due_utc, seq, fire_utc, group in self._heap:
+                kept = tuple(r for r in group if r not in removed)
+                if kept:
+                    heap.append((due_utc, seq, fire_utc, kept))
+            heapq.heapify(heap)
+            self._heap = heap
+        if added and self._built_through is not None:
+            added = set(added)
+            now = self.now()
+            day = now.astimezone(self.tz).date()
+            while day <= self._built_through:
+                for fire_utc, group in fire_times_for_day(index, self.tz, day, only=added):
+                    if fire_utc >= now:
+                        self._push(fire_utc, fire_utc, group)
+                day += timedelta(days=1)
+        self._wake()
+
+    def _wake(self):
+        if self._sleeper is not None:
+            self._sleeper.cancel()  # the next fire may have moved
+
+    def next_fire(self):
+        """(due_utc, reminders) of the next pending fire instant"""
+        self._extend(self.now())
+        due_utc, _, _, group = self._heap[0]
+        return due_utc, group
+
+    def deadline(self, reminder, event_utc):
+        """When a warning stops being worth sending: the event's next warning fires, or it starts"""
+        return event_utc - timedelta(minutes=self.index.next_lead(reminder))
+
+    def _still_useful(self, fire_utc, deadline, now):
+        return now < deadline and now - fire_utc <= self.grace
+
+    async def _deliver(self, reminder, fire_utc):
+        event_utc = fire_utc + timedelta(minutes=reminder.lead)
+        key = reminder_id(reminder, event_utc)
+        if self.journal is not None and key in self.journal:
+            return  # already delivered before a restart
+        now = self.now()
+        deadline = self.deadline(reminder, event_utc)
+        fields = {'event_id': key, 'fire_time': fire_utc.isoformat()}
+        if not self._still_useful(fire_utc, deadline, now):
+            log.warning("⚠️ Missed %s (%.0fs late)", key, (now - fire_utc).total_seconds(), extra=fields)
+            return
+        try:
+            ok = await self.callback(reminder, event_utc) is not False
+        except Exception as e:
+            log.exception("❌ Reminder error: %s", e, extra=fields)
+            ok = False
+        if ok:
+            if self.journal is not None:
+                self.journal.record(key)
+        elif self._still_useful(fire_utc, deadline, self.now() + RETRY_DELAY):
+            self._push(self.now() + RETRY_DELAY, fire_utc, (reminder,))
+            self._wake()
+        else:
+            log.error("❌ Gave up on %s", key, extra=fields)
+
+    async def _run(self):
+        while True:
+            with cpu_timer('scheduler'):
+                due_utc, _ = self.next_fire()
+            delay = (due_utc - self.now()).total_seconds()
+            if delay > EARLY_WAKE_TOLERANCE:
+                self._sleeper = asyncio.ensure_future(self.clock.sleep(delay))
+                try:
+                    await asyncio.wait({self._sleeper})  # cancelled early by replace_index()
+                finally:
+                    self._sleeper.cancel()
+                    self._sleeper = None
+                continue  # re-check against the wall clock before firing
+            metrics.REMINDER_WAKE_LAG.observe(max(0.0, -delay))
+            _, _, fire_utc, group = heapq.heappop(self._heap)
+            # Reminders sharing a fire instant go out together (countdowns merge them), off the timer
+            delivery = asyncio.ensure_future(asyncio.gather(*(self._deliver(reminder, fire_utc) for reminder in group)))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
@@ -0,0 +1,71 @@
+"""
+Shard ownership of the notification channels.
+
+Discord routes a guild to shard (guild_id >> 22) % shard_count, and DMs to
+shard 0. A process running a subset of the shards only fans reminders out
+to channels whose guild is on one of its shards, so processes with disjoint
+shard ranges never post the same reminder twice. Channel guilds are looked
+up over REST, so this works before the gateway is ready; a lookup that fails
+is retried in the background, so the channel is not silently left out.
+"""
+import asyncio
+import logging
+
+log = logging.getLogger('bot.shards')
+
+RESOLVE_RETRY = 30.0       # seconds before retrying failed channel lookups
+RESOLVE_RETRY_MAX = 600.0  # longest backoff between retries
+
+
+def parse_shard_ids(text):
+    """'0-3,6' -> [0, 1, 2, 3, 6]; empty -> None (every shard)"""
+    if not text or not text.strip():
+        return None
+    ids = set()
+    for part in text.split(','):
+        first, _, last = part.strip().partition('-')
+        ids.update(range(int(first), int(last or first) + 1))
+    return sorted(ids)
+
+
+def shard_of(guild_id, shard_count):
+    return (guild_id >> 22) % shard_count if guild_id else 0
+
+
+def shard_label(shard_ids, shard_count):
+    """File-name safe name of a shard range for leases and journals, e.g. '0_1of4' or 'all'"""
+    if shard_ids is None or not shard_count:
+        return 'all'
+    return f"{'_'.join(map(str, shard_ids))}of{shard_count}"
+
+
+async def local_channels(broadcaster, channel_ids, shard_ids, shard_count):
+    """
+    The channels among `channel_ids` that belong to this process's shards, looked
+    up concurrently through the rate-limited broadcaster. Returns (local channels,
+    channels whose lookup failed in a way worth retrying).
+    """
+    if shard_ids is None or not shard_count:
+        return list(channel_ids), []
+    owned = set(shard_ids)
+    result, channels = await broadcaster.get_channels(list(channel_ids))
+    if result.failed:
+        log.error("❌ Could not look up %d of %d channels, %d will be retried", result.failed, len(channel_ids),
+                  len(result.retry), extra={'channels': len(channel_ids)})
+    local = []
+    for channel_id, channel in channels.items():
+        guild_id = int(channel['guild_id']) if channel.get('guild_id') else None
+        if shard_of(guild_id, shard_count) in owned:
+            local.append(channel_id)
+    return local, list(result.retry)
+
+
+async def resolve_later(broadcaster, channel_ids, shard_ids, shard_count, local, delay=RESOLVE_RETRY):
+    """Retry failed lookups with backoff, adding channels on our shards to `local` as they resolve"""
+    while channel_ids:
+        await asyncio.sleep(delay)
+        found, channel_ids = await local_channels(broadcaster, channel_ids, shard_ids, shard_count)
+        local.extend(found)
+        if found:
+            log.info("Resolved %d more channels on our shards", len(found), extra={'channels': len(found)})
+        delay = min(delay * 2, RESOLVE_RETRY_MAX)
@@ -0,0 +1,265 @@
+"""
+Per-user reminder subscriptions.
+
+Members register a timezone, the events they care about and how they want
+to be reached: DM, a mention in the channel they subscribed from, or a
+mention of a role there, which costs one message per channel, role and UTC
+offset however many members subscribed it. The
+SQLite file is only read once at startup into an in-memory index keyed by
+timezone; writes are queued, in order, to a single writer thread so neither
+commands nor reminder delivery wait on disk.
+
+At fire time subscribers are grouped by the UTC offset their zone has at
+the event instant, so each distinct offset is formatted once no matter how
+many people share it.
+"""
+import asyncio
+import logging
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from zoneinfo import ZoneInfo
+
+from broadcast import BroadcastResult
+from loopwatch import cpu_timer
+from schedule import format_12h
+
+log = logging.getLogger('bot.subscriptions')
+
+MAX_MESSAGE_LENGTH = 2000    # Discord message limit
+
+DELIVERY_MODES = ('dm', 'mention', 'role')
+
+# events: frozenset of "<game>/<event>" names (see event_key), empty for every event
+# role_id: the role mentioned in channel_id, for 'role' delivery
+Subscription = namedtuple('Subscription', ['user_id', 'timezone', 'events', 'delivery', 'channel_id', 'dm_channel_id',
+                                           'role_id'], defaults=(None,))
+
+
+class SubscriptionStore:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)  # written from the writer thread
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='subscriptions')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                user_id INTEGER PRIMARY KEY,
+                timezone TEXT NOT NULL,
+                events TEXT NOT NULL,
+                delivery TEXT NOT NULL,
+                channel_id INTEGER,
+                dm_channel_id INTEGER,
+                role_id INTEGER
+            )''')
+        if 'role_id' not in {row[1] for row in self.db.execute('PRAGMA table_info(subscriptions)')}:
+            self.db.execute('ALTER TABLE subscriptions ADD COLUMN role_id INTEGER')  # files from before role delivery
+        self.db.commit()
+        self._by_user = {}
+        self._by_zone = {}  # timezone name -> {user_id: Subscription}
+        for user_id, tz, events, delivery, channel_id, dm_channel_id, role_id in self.db.execute(
+                'SELECT user_id, timezone, events, delivery, channel_id, dm_channel_id, role_id FROM subscriptions'):
+            events = frozenset(e for e in events.split(',') if e)
+            self._index(Subscription(user_id, tz, events, delivery, channel_id, dm_channel_id, role_id))
+
+    def __len__(self):
+        return len(self._by_user)
+
+    def _index(self, subscription):
+        self._unindex(subscription.user_id)
+        self._by_user[subscription.user_id] = subscription
+        self._by_zone.setdefault(subscription.timezone, {})[subscription.user_id] = subscription
+
+    def _unindex(self, user_id):
+        old = self._by_user.pop(user_id, None)
+        if old is not None:
+            zone = self._by_zone[old.timezone]
+            del zone[user_id]
+            if not zone:
+                del self._by_zone[old.timezone]
+
+    def _write(self, statement, params, many=False):
+        """Queue a write for the writer thread (run inline when no loop is running)"""
+        def write():
+            (self.db.executemany if many else self.db.execute)(statement, params)
+            self.db.commit()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            write()
+            return
+        loop.run_in_executor(self._writer, write).add_done_callback(self._written)
+
+    @staticmethod
+    def _written(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.error("❌ Subscription write failed: %s", future.exception())
+
+    def close(self):
+        """Finish queued writes and close the database"""
+        self._writer.shutdown(wait=True)
+        self.db.close()
+
+    def get(self, user_id):
+        return self._by_user.get(user_id)
+
+    def subscribe(self, user_id, tz, events, delivery, channel_id, role_id=None):
+        """Create or replace a user's subscription; raises ValueError on bad input"""
+        ZoneInfo(tz)  # raises for unknown zones
+        if delivery not in DELIVERY_MODES:
+            raise ValueError(f"delivery must be one of {', '.join(DELIVERY_MODES)}")
+        if (delivery == 'role') != (role_id is not None):
+            raise ValueError("role delivery needs a role, and only role delivery takes one")
+        old = self._by_user.get(user_id)
+        subscription = Subscription(user_id, tz, frozenset(events), delivery, channel_id,
+                                    old.dm_channel_id if old else None, role_id)
+        self._write('INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, tz, ','.join(sorted(subscription.events)), delivery, channel_id,
+                     subscription.dm_channel_id, role_id))
+        self._index(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id):
+        if user_id not in self._by_user:
+            return False
+        self._write('DELETE FROM subscriptions WHERE user_id = ?', (user_id,))
+        self._unindex(user_id)
+        return True
+
+    def remember_dm_channels(self, pairs):
+        """Persist opened DM channels as (user_id, dm_channel_id) pairs, in one transaction"""
+        pairs = [(user_id, channel_id) for user_id, channel_id in pairs if user_id in self._by_user]
+        if not pairs:
+            return
+        self._write('UPDATE subscriptions SET dm_channel_id = ? WHERE user_id = ?',
+                    [(channel_id, user_id) for user_id, channel_id in pairs], many=True)
+        for user_id, channel_id in pairs:
+            self._index(self._by_user[user_id]._replace(dm_channel_id=channel_id))
+
+    def by_offset(self, game, event, moment):
+        """
+        {utc offset: [subscriptions]} of everyone following `event` of `game`, at
+        instant `moment`. Bare event names saved before events were keyed by game
+        still match that event in every game.
+        """
+        key = event_key(game, event)
+        groups = {}
+        for zone_name, members in self._by_zone.items():
+            offset = moment.astimezone(ZoneInfo(zone_name)).utcoffset()
+            for subscription in members.values():
+                if not subscription.events or key in subscription.events or event in subscription.events:
+                    groups.setdefault(offset, []).append(subscription)
+        return groups
+
+
+def event_key(game, event):
+    """How a subscription names one game's event, e.g. 'Cabal/Nation War'"""
+    return f"{game}/{event}"
+
+
+def format_offset(offset):
+    minutes = int(offset.total_seconds()) // 60
+    sign = '+' if minutes >= 0 else '-'
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"UTC{sign}{hours}" + (f":{minutes:02d}" if minutes else "")
+
+
+def personal_message(reminder, event_utc, offset):
+    """Reminder text in the local time of everyone at `offset`"""
+    local = event_utc.astimezone(timezone(offset))
+    local_time = f"{format_12h(local.hour, local.minute)} {format_offset(offset)}"
+    return f"{reminder.icon} {reminder.event} in {reminder.lead}min at {local_time} (your time)! {reminder.icon}"
+
+
+def chunk_mentions(user_ids, message):
+    """
+    Split mentions so message + mentions stays under Discord's length limit.
+    Returns [(chunk, user ids mentioned in it)].
+    """
+    chunks, current, mentioned = [], message, []
+    for user_id in user_ids:
+        mention = f" <@{user_id}>"
+        if len(current) + len(mention) > MAX_MESSAGE_LENGTH:
+            chunks.append((current, mentioned))
+            current, mentioned = message, []
+        current += mention
+        mentioned.append(user_id)
+    if mentioned:
+        chunks.append((current, mentioned))
+    return chunks
+
+
+class PersonalDelivery:
+    def __init__(self, store, broadcaster):
+        self.store = store
+        self.broadcaster = broadcaster
+
+    async def _dm_channels(self, subscriptions, deadline):
+        """
+        DM channels of the subscribers as {channel id: user id}, opening missing
+        ones through the broadcaster so they share its pacing and 429 handling.
+        Returns (BroadcastResult of the opens, channels). A user whose DM could
+        not be opened is tried again on the next attempt.
+        """
+        missing = [subscription.user_id for subscription in subscriptions if subscription.dm_channel_id is None]
+        result, opened = await self.broadcaster.open_dms(missing, deadline=deadline)
+        if result.failed:
+            log.warning("❌ Could not open %d of %d DMs", result.failed, len(missing), extra={'sample': 'open_dm'})
+        self.store.remember_dm_channels(opened.items())
+        channels = {}
+        for subscription in subscriptions:
+            channel_id = subscription.dm_channel_id or opened.get(subscription.user_id)
+            if channel_id is not None:
+                channels[channel_id] = subscription.user_id
+        return result, channels
+
+    async def deliver(self, reminder, event_utc, fired_at=None, skip=None, deadline=None):
+        """
+        Send a reminder to every subscriber, formatted once per UTC offset.
+
+        skip: predicate, true for user ids that already have this reminder
+        deadline: time.time() until which rate-limited sends retry (default: the event start)
+        Returns a BroadcastResult whose delivered / retry are user ids.
+        """
+        if deadline is None:
+            deadline = event_utc.timestamp()
+        sends = []
+        with cpu_timer('personal_grouping'):
+            groups = self.store.by_offset(reminder.game, reminder.event, event_utc)
+        for offset, subscriptions in groups.items():
+            if skip is not None:
+                subscriptions = [s for s in subscriptions if not skip(s.user_id)]
+            message = personal_message(reminder, event_utc, offset)
+            dms = [s for s in subscriptions if s.delivery == 'dm']
+            if dms:
+                sends.append(self._send_dms(dms, message, fired_at, deadline))
+            by_channel, by_role = {}, {}
+            for subscription in subscriptions:
+                if subscription.delivery == 'mention' and subscription.channel_id:
+                    by_channel.setdefault(subscription.channel_id, []).append(subscription.user_id)
+                elif subscription.delivery == 'role' and subscription.channel_id:
+                    by_role.setdefault((subscription.channel_id, subscription.role_id), []).append(subscription.user_id)
+            for channel_id, user_ids in by_channel.items():
+                for chunk, mentioned in chunk_mentions(user_ids, message):
+                    sends.append(self._send_mentions(channel_id, chunk, mentioned, fired_at, deadline))
+            # One role mention answers every subscriber who asked for that role in that channel
+            for (channel_id, role_id), user_ids in by_role.items():
+                sends.append(self._send_mentions(channel_id, f"{message} <@&{role_id}>", user_ids, fired_at, deadline))
+        results = await asyncio.gather(*sends)
+        delivered = tuple(user_id for result in results for user_id in result.delivered)
+        return BroadcastResult(len(delivered), sum(result.failed for result in results),
+                               sum(result.rate_limited for result in results),
+                               max((result.latency for result in results), default=0.0),
+                               delivered, tuple(user_id for result in results for user_id in result.retry))
+
+    async def _send_mentions(self, channel_id, chunk, user_ids, fired_at, deadline):
+        result = await self.broadcaster.broadcast([channel_id], chunk, fired_at=fired_at, deadline=deadline)
+        return result._replace(delivered=tuple(user_ids) if result.delivered else (),
+                               retry=tuple(user_ids) if result.retry else ())
+
+    async def _send_dms(self, subscriptions, message, fired_at, deadline):
+        opens, channels = await self._dm_channels(subscriptions, deadline)
+        result = await self.broadcaster.broadcast(list(channels), message, fired_at=fired_at, deadline=deadline)
+        return result._replace(failed=result.failed + opens.failed,
+                               rate_limited=result.rate_limited + opens.rate_limited,
+                               delivered=tuple(channels[channel_id] for channel_id in result.delivered),
+                               retry=tuple(channels[channel_id] for channel_id in result.retry) + opens.retry)
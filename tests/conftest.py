@@ -0,0 +1,22 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+
+# The bot's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_discord import FakeDiscord  # noqa: E402
+from broadcast import RestTransport  # noqa: E402
+
+
+@asynccontextmanager
+async def fake_api(guilds=4, channels_per_guild=5, **kwargs):
+    """A local fake Discord (FakeDiscord options as kwargs) and a RestTransport talking to it"""
+    fake = FakeDiscord(guilds=guilds, channels_per_guild=channels_per_guild, **kwargs)
+    url = await fake.start()
+    transport = RestTransport('token', url)
+    try:
+        yield fake, transport
+    finally:
+        await transport.close()
+        await fake.stop()
@@ -0,0 +1,128 @@
+"""Broadcaster against the local fake Discord REST API: per-channel 429s, global 429s and 403s"""
+import asyncio
+import time
+
+from broadcast import Broadcaster
+from conftest import fake_api
+
+
+def statuses(fake, status):
+    return sum(count for (method, _, code), count in fake.requests.items() if method == 'POST' and code == status)
+
+
+def test_channel_429s_retry_until_delivered():
+    async def run():
+        async with fake_api(rate_limit_rate=0.9, retry_after=0.05, channel_bucket=0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            channel_ids = fake.guild_channels()[:10]
+            results = await asyncio.gather(*(broadcaster.broadcast([channel_id], "hello") for channel_id in channel_ids))
+            assert [result.sent for result in results] == [1] * 10
+            assert sum(result.rate_limited for result in results) == sum(fake.rate_limited.values())
+            assert max(result.rate_limited for result in results) > 3  # more than any fixed retry count allowed
+            assert sorted(posted.channel_id for posted in fake.posted) == sorted(channel_ids)
+    asyncio.run(run())
+
+
+def test_exhausted_bucket_waits_for_its_reset():
+    async def run():
+        async with fake_api(channel_bucket=2, channel_reset=0.3) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            channel_id = fake.guild_channels()[0]
+            results = await asyncio.gather(*(broadcaster.broadcast([channel_id], f"message {n}") for n in range(5)))
+            assert [result.sent for result in results] == [1] * 5
+            assert len(fake.posted) == 5
+    asyncio.run(run())
+
+
+def test_channel_429s_stop_at_the_deadline():
+    async def run():
+        async with fake_api(channel_bucket=1, channel_reset=2.0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            channel_id = fake.guild_channels()[0]
+            deadline = time.time() + 0.5
+            results = await asyncio.gather(*(broadcaster.broadcast([channel_id], f"message {n}", deadline=deadline)
+                                             for n in range(2)))
+            assert sorted(result.sent for result in results) == [0, 1]
+            assert [result.retry for result in results if not result.sent] == [(channel_id,)]
+            assert time.time() < deadline + 0.5  # gave up instead of sleeping out the 2s reset
+    asyncio.run(run())
+
+
+def test_global_429s_pause_everyone_and_every_channel_is_delivered():
+    async def run():
+        async with fake_api(global_limit=5, channel_bucket=0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            gate = asyncio.Event()
+            gate.set()
+            broadcaster.share_global_gate(gate)
+            closed = []
+
+            async def watch():
+                while True:
+                    await asyncio.sleep(0.01)
+                    if not gate.is_set():
+                        closed.append(time.monotonic())
+
+            watcher = asyncio.create_task(watch())
+            channel_ids = fake.guild_channels()
+            result = await broadcaster.broadcast(channel_ids, "hello", deadline=time.time() + 10)
+            watcher.cancel()
+            assert result.sent == len(channel_ids) and result.failed == 0
+            assert fake.rate_limited['global'] > 0
+            assert closed  # the shared gate was held while the global limit cleared
+            assert gate.is_set()
+            assert sorted(posted.channel_id for posted in fake.posted) == sorted(channel_ids)
+    asyncio.run(run())
+
+
+def test_sharing_the_gate_mid_pause_releases_senders_parked_on_the_old_one():
+    async def run():
+        async with fake_api(channel_bucket=0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            broadcaster._block_global(0.2)
+            channel_ids = fake.guild_channels()[:3]
+            sending = asyncio.create_task(broadcaster.broadcast(channel_ids, "hello", deadline=time.time() + 5))
+            await asyncio.sleep(0.05)
+            gate = asyncio.Event()
+            broadcaster.share_global_gate(gate)
+            result = await asyncio.wait_for(sending, 3)
+            assert result.sent == 3 and gate.is_set()
+    asyncio.run(run())
+
+
+def test_a_global_pause_past_the_deadline_gives_up():
+    async def run():
+        async with fake_api(channel_bucket=0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            broadcaster._block_global(10)
+            channel_ids = fake.guild_channels()[:3]
+            deadline = time.time() + 0.2
+            result = await broadcaster.broadcast(channel_ids, "hello", deadline=deadline)
+            assert result.sent == 0 and sorted(result.retry) == sorted(channel_ids)
+            assert time.time() < deadline + 0.5 and not fake.posted
+    asyncio.run(run())
+
+
+def test_forbidden_channels_fail_once_without_holding_up_the_rest():
+    async def run():
+        async with fake_api() as (fake, transport):
+            channel_ids = sorted(fake.channels)
+            fake.forbidden = set(channel_ids[:3])
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            result = await broadcaster.broadcast(channel_ids, "hello", deadline=time.time() + 10)
+            assert (result.sent, result.failed, result.rate_limited) == (len(channel_ids) - 3, 3, 0)
+            assert sorted(result.delivered) == channel_ids[3:] and result.retry == ()
+            assert statuses(fake, 403) == 3  # not retried
+    asyncio.run(run())
+
+
+def test_dm_opens_are_paced_and_retried():
+    async def run():
+        async with fake_api(global_limit=5, channel_bucket=0) as (fake, transport):
+            broadcaster = Broadcaster(transport, global_rate=1000)
+            user_ids = list(range(1, 21))
+            result, opened = await broadcaster.open_dms(user_ids, deadline=time.time() + 10)
+            assert sorted(opened) == sorted(result.delivered) == user_ids
+            assert fake.rate_limited['global'] > 0
+            assert all(fake.channels[channel_id] is None for channel_id in opened.values())
+    asyncio.run(run())
@@ -0,0 +1,47 @@
+"""Countdown mode against the local fake Discord REST API, on a simulated clock"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from broadcast import Broadcaster
+from clock import SimulatedClock
+from conftest import fake_api
+from countdown import EXPIRE_AFTER, REAP_DELAY, CountdownDelivery
+from schedule import DEFAULT_TEMPLATE, Reminder
+
+
+def reminder(lead):
+    return Reminder('Nation War', 20, 0, lead, 'Cabal', '⚔️', DEFAULT_TEMPLATE)
+
+
+def calls(fake, method, suffix=''):
+    return {status: count for (m, route, status), count in fake.requests.items()
+            if m == method and route.endswith(suffix)}
+
+
+def test_countdown_edits_in_place_and_falls_back_to_single_deletes():
+    async def run():
+        async with fake_api(guilds=1, channels_per_guild=2) as (fake, transport):
+            managed, unmanaged = fake.guild_channels()
+            fake.unmanaged = {unmanaged}
+            clock = SimulatedClock(datetime.now(timezone.utc))
+            countdown = CountdownDelivery(Broadcaster(transport, global_rate=1000), [managed, unmanaged], clock)
+            first, second = clock.now() + timedelta(minutes=5), clock.now() + timedelta(minutes=10)
+
+            assert (await countdown.update(reminder(5), first)).sent == 2
+            assert (await countdown.update(reminder(1), first)).sent == 2
+            assert (await countdown.update(reminder(5), second)).sent == 2
+            assert calls(fake, 'POST', '/messages') == {200: 4}
+            assert calls(fake, 'PATCH') == {200: 2}  # the last warning is not followed by a NOW edit
+
+            # Both countdowns expire inside one reap window
+            await clock.settle(2)
+            clock.advance((timedelta(minutes=10) + EXPIRE_AFTER).total_seconds())
+            await clock.settle(1)
+            clock.advance(REAP_DELAY)
+            for _ in range(200):
+                if sum(calls(fake, 'DELETE').values()) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert calls(fake, 'POST', '/bulk-delete') == {204: 1, 403: 1}
+            assert calls(fake, 'DELETE') == {204: 2}
+    asyncio.run(run())
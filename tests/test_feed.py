@@ -0,0 +1,65 @@
+"""Schedule feeds: conditional GETs and validators that only move with the content"""
+import asyncio
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from clock import SimulatedClock
+from feed import ScheduleFeed, http_date
+from health import create_app
+
+TZ = ZoneInfo('Europe/Lisbon')
+MORNING = datetime(2025, 1, 15, 9, 0, tzinfo=TZ).astimezone(timezone.utc)
+
+
+def feed_client(clock):
+    # The feed routes never touch the bot
+    return TestClient(TestServer(create_app(None, ScheduleFeed(TZ, clock=clock))))
+
+
+def test_matching_validators_get_a_304():
+    async def run():
+        async with feed_client(SimulatedClock(MORNING)) as client:
+            for path in ('/schedule.ics', '/schedule.json'):
+                response = await client.get(path)
+                assert response.status == 200 and await response.read()
+                etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+                for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+                    response = await client.get(path, headers={'If-None-Match': if_none_match})
+                    assert response.status == 304 and response.headers['ETag'] == etag
+                    assert await response.read() == b''
+                assert (await client.get(path, headers={'If-None-Match': '"other"'})).status == 200
+                assert (await client.get(path, headers={'If-Modified-Since': last_modified})).status == 304
+                # If-None-Match wins over a matching If-Modified-Since
+                assert (await client.get(path, headers={'If-None-Match': '"other"',
+                                                        'If-Modified-Since': last_modified})).status == 200
+                earlier = http_date(datetime(2025, 1, 1, tzinfo=timezone.utc))
+                assert (await client.get(path, headers={'If-Modified-Since': earlier})).status == 200
+    asyncio.run(run())
+
+
+def test_validators_are_stable_through_the_local_day():
+    async def run():
+        clock = SimulatedClock(MORNING)
+        async with feed_client(clock) as client:
+            morning = (await client.get('/schedule.ics')).headers
+            clock.advance(13 * 3600)  # 22:00 local
+            evening = await client.get('/schedule.ics', headers={'If-None-Match': morning['ETag']})
+            assert evening.status == 304
+            assert (evening.headers['ETag'], evening.headers['Last-Modified']) == (morning['ETag'],
+                                                                                 morning['Last-Modified'])
+            clock.advance(3 * 3600)  # 01:00 the next day: a new window
+            tomorrow = await client.get('/schedule.ics', headers={'If-None-Match': morning['ETag']})
+            assert tomorrow.status == 200 and tomorrow.headers['ETag'] != morning['ETag']
+    asyncio.run(run())
+
+
+def test_rerendering_identical_content_keeps_last_modified():
+    clock = SimulatedClock(MORNING)
+    feed = ScheduleFeed(TZ, clock=clock)
+    body, etag, last_modified = feed.get('json')
+    clock.advance(3600)
+    feed.replace_index(feed.index)  # a reload that changed nothing
+    assert feed.get('json') == (body, etag, last_modified)
+    assert last_modified == MORNING
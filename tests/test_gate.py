@@ -0,0 +1,99 @@
+"""Command gate: coalescing, cooldowns, and releasing commands that fail"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from gate import CommandGate, Suppressed
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Context:
+    """The parts of a commands.Context the gate reads"""
+
+    def __init__(self, channel_id, user_id, command='schedule', interaction=None):
+        self.channel = SimpleNamespace(id=channel_id)
+        self.author = SimpleNamespace(id=user_id)
+        self.command = SimpleNamespace(qualified_name=command)
+        self.interaction = interaction
+        self.sent = []
+
+    async def send(self, content, **kwargs):
+        self.sent.append((content, kwargs))
+
+
+def suppressed(gate, *args):
+    with pytest.raises(Suppressed) as raised:
+        gate.admit(*args)
+    return raised.value.reason, round(raised.value.retry_after, 1)
+
+
+def test_identical_commands_coalesce_while_running_and_inside_the_window():
+    clock = Clock()
+    gate = CommandGate(window=3, clock=clock)
+    gate.admit(1, 10, 'schedule')
+    assert suppressed(gate, 1, 11, 'schedule') == ('coalesced', 3)  # still running
+    gate.admit(1, 11, 'times')  # another command
+    gate.admit(2, 11, 'schedule')  # another channel
+    clock.now = 5
+    gate.finished(1, 'schedule')
+    clock.now = 7
+    assert suppressed(gate, 1, 12, 'schedule') == ('coalesced', 1)
+    clock.now = 8
+    gate.admit(1, 12, 'schedule')
+    assert gate.suppressed == 2
+
+
+def test_user_and_channel_cooldowns():
+    clock = Clock()
+    gate = CommandGate(window=0, user_cooldown=10, channel_cooldown=4, clock=clock)
+    gate.admit(1, 10, 'schedule')
+    gate.finished(1, 'schedule')
+    clock.now = 2
+    assert suppressed(gate, 2, 10, 'times') == ('user_cooldown', 8)
+    assert suppressed(gate, 1, 11, 'times') == ('channel_cooldown', 2)
+    gate.admit(2, 11, 'times')
+    gate.finished(2, 'times')
+    clock.now = 6
+    gate.admit(1, 12, 'times')
+    clock.now = 9.5
+    assert suppressed(gate, 3, 10, 'schedule') == ('user_cooldown', 0.5)
+    clock.now = 10
+    gate.admit(3, 10, 'schedule')
+
+
+def test_a_failed_command_is_released():
+    async def run():
+        clock = Clock()
+        gate = CommandGate(window=3, clock=clock)
+        ctx = Context(1, 10)
+        await gate.hook()(lambda: None).__before_invoke__(ctx)
+        assert ctx.gated and suppressed(gate, 1, 11, 'schedule')[0] == 'coalesced'
+        assert await gate.on_error(ctx, RuntimeError('boom')) is False  # left to the default handler
+        clock.now = 3
+        gate.admit(1, 11, 'schedule')  # the window counts from the failure, not forever
+        assert ctx.sent == []
+    asyncio.run(run())
+
+
+def test_only_interactions_get_an_ephemeral_reply():
+    async def run():
+        gate = CommandGate(window=3, clock=Clock())
+        gate.admit(1, 10, 'schedule')
+        prefix, slash = Context(1, 11), Context(1, 12, interaction=object())
+        for ctx in (prefix, slash):
+            try:
+                gate.admit(1, ctx.author.id, 'schedule')
+            except Suppressed as error:
+                assert await gate.on_error(ctx, error) is True
+        assert prefix.sent == []
+        assert slash.sent == [("⏳ Answered just now, try again in 3.0s", {'ephemeral': True})]
+        gate.finished(1, 'schedule')  # the suppressed contexts were never admitted, the first one still runs
+    asyncio.run(run())
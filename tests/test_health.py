@@ -0,0 +1,55 @@
+"""/health answers for the process, /ready for the gateway"""
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from health import GatewayWatch, create_app, process_state
+
+
+class Bot:
+    """The parts of discord.py's Bot the health endpoints read"""
+    latency = float('inf')
+    ready = False
+
+    def is_ready(self):
+        return self.ready
+
+    def is_closed(self):
+        return False
+
+
+def test_health_is_up_once_reminders_run_without_waiting_for_the_gateway():
+    async def run():
+        bot, state = Bot(), ['starting']
+        async with TestClient(TestServer(create_app(bot, reminders=lambda: state[0]))) as client:
+            assert (await client.get('/health')).status == 503
+            state[0] = 'running'
+            response = await client.get('/health')
+            assert response.status == 200
+            assert (await response.json())['gateway']['ready'] is False
+            assert (await client.get('/ready')).status == 503
+            bot.ready, bot.latency = True, 0.05
+            assert (await client.get('/ready')).status == 200
+            state[0] = 'standby'
+            assert (await client.get('/health')).status == 200
+    asyncio.run(run())
+
+
+def test_health_fails_once_the_gateway_outlasts_its_grace():
+    bot, now = Bot(), [0.0]
+    watch = GatewayWatch(bot, grace=60, clock=lambda: now[0])
+    now[0] = 59  # still logging in after boot
+    assert process_state(watch)[0]
+    now[0] = 61  # never came up
+    healthy, details = process_state(watch)
+    assert not healthy and details['status'] == 'gateway down'
+    bot.ready, bot.latency = True, 0.05
+    assert process_state(watch)[0]
+    bot.ready, now[0] = False, 100  # disconnected: the grace restarts from here
+    assert process_state(watch)[0]
+    now[0] = 159
+    assert process_state(watch)[0]
+    now[0] = 161
+    assert not process_state(watch)[0]
+    bot.ready = True  # resumed
+    assert process_state(watch)[0] and watch.down_since is None
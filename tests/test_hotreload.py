@@ -0,0 +1,119 @@
+"""Schedule hot reload: the scheduler's pending fires follow the file, exactly once"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from clock import SimulatedClock
+from hotreload import ScheduleWatcher
+from schedule import ScheduleIndex, build_reminders, load_reminders, reminder_message
+from scheduler import ReminderScheduler
+
+TZ = ZoneInfo('Europe/Lisbon')
+START = datetime(2025, 1, 15, 16, 50, tzinfo=TZ).astimezone(timezone.utc)  # WET, so local == UTC
+
+
+def definitions(*events):
+    return {'games': [{'name': 'Cabal', 'events': list(events)}]}
+
+
+NATION_WAR = {'name': 'Nation War', 'times': ['17:00'], 'leads': [5, 1], 'templates': {'5': '{event} in {lead}', '1': '{event} in {lead}'}}
+WORLD_BOSS = {'name': 'World Boss', 'times': ['17:30'], 'leads': [2], 'templates': {'2': '{event} in {lead}'}}
+
+
+def replay(tmp_path, edits, minutes=45):
+    """
+    Fire the schedule from 16:50 local time for `minutes`, writing edits[minute]
+    (definitions, or raw text) to the file and checking it at that local "HH:MM".
+    Returns the fires as ("HH:MM", message).
+    """
+    path = tmp_path / 'schedules.json'
+    path.write_text(json.dumps(definitions(NATION_WAR, WORLD_BOSS)))
+    index = ScheduleIndex(load_reminders(str(path)))
+    fires = []
+
+    async def run():
+        clock = SimulatedClock(START)
+
+        async def send(reminder, event_utc):
+            fires.append((clock.now().strftime('%H:%M'), reminder_message(reminder, event_utc)))
+
+        scheduler = ReminderScheduler(index, TZ, send, clock=clock)
+        watcher = ScheduleWatcher(str(path), index, [scheduler])
+        scheduler.start()
+        await clock.settle()
+        for step in range(minutes):
+            minute = clock.now().strftime('%H:%M')
+            if minute in edits:
+                edit = edits[minute]
+                path.write_text(edit if isinstance(edit, str) else json.dumps(edit))
+                os.utime(path, ns=(step + 1, step + 1))  # a new mtime even within the filesystem's granularity
+                await watcher.check()
+                await clock.settle()
+            clock.advance(60)
+            await clock.settle()
+        scheduler.stop()
+
+    asyncio.run(run())
+    return fires
+
+
+UNCHANGED = [('16:55', 'Nation War in 5'), ('16:59', 'Nation War in 1'), ('17:28', 'World Boss in 2')]
+
+
+def test_replace_index_adds_and_removes_pending_fires():
+    old = build_reminders(definitions(NATION_WAR, WORLD_BOSS))
+    new = build_reminders(definitions(NATION_WAR, dict(WORLD_BOSS, times=['17:10', '17:20'])))
+    fires = []
+
+    async def run():
+        clock = SimulatedClock(START)
+
+        async def send(reminder, event_utc):
+            fires.append((clock.now().strftime('%H:%M'), reminder.event, reminder.hour, reminder.minute))
+
+        scheduler = ReminderScheduler(ScheduleIndex(old), TZ, send, clock=clock)
+        scheduler.start()
+        await clock.settle()
+        for _ in range(45):
+            if clock.now().strftime('%H:%M') == '17:09':
+                scheduler.replace_index(ScheduleIndex(new), [r for r in new if r not in old],
+                                        [r for r in old if r not in new])
+                await clock.settle()
+            clock.advance(60)
+            await clock.settle()
+        scheduler.stop()
+
+    asyncio.run(run())
+    # 17:08 was already past when 17:10 was added, 17:30 was removed before firing
+    assert fires == [('16:55', 'Nation War', 17, 0), ('16:59', 'Nation War', 17, 0),
+                     ('17:18', 'World Boss', 17, 20)]
+
+
+def test_unchanged_file_fires_as_loaded(tmp_path):
+    assert replay(tmp_path, {}) == UNCHANGED
+
+
+def test_added_reminder_fires_without_disturbing_the_rest(tmp_path):
+    boss = dict(WORLD_BOSS, times=['17:15', '17:30'])
+    fires = replay(tmp_path, {'16:57': definitions(NATION_WAR, boss)})
+    assert fires == [('16:55', 'Nation War in 5'), ('16:59', 'Nation War in 1'),
+                     ('17:13', 'World Boss in 2'), ('17:28', 'World Boss in 2')]
+
+
+def test_removed_event_stops_firing(tmp_path):
+    assert replay(tmp_path, {'16:57': definitions(WORLD_BOSS)}) == [('16:55', 'Nation War in 5'),
+                                                                     ('17:28', 'World Boss in 2')]
+
+
+def test_template_change_mid_day_applies_to_the_next_warning_only(tmp_path):
+    war = dict(NATION_WAR, templates={'5': 'War soon: {lead}', '1': 'War now: {lead}'})
+    fires = replay(tmp_path, {'16:57': definitions(war, WORLD_BOSS)})
+    # the 5-minute warning already went out and is not repeated in the new wording
+    assert fires == [('16:55', 'Nation War in 5'), ('16:59', 'War now: 1'), ('17:28', 'World Boss in 2')]
+
+
+def test_malformed_file_keeps_the_running_schedule(tmp_path):
+    broken = dict(NATION_WAR, times=['25:00'])
+    assert replay(tmp_path, {'16:52': '{"games": [', '16:53': definitions(broken, WORLD_BOSS)}) == UNCHANGED
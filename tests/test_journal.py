@@ -0,0 +1,38 @@
+"""Delivery journal: batching, reload under concurrent flushes"""
+import asyncio
+import time
+
+from journal import DeliveryJournal
+
+
+def test_reload_picks_up_a_replica_and_races_no_flush(tmp_path):
+    path = str(tmp_path / 'reminders.journal')
+
+    async def run():
+        journal = DeliveryJournal(path, flush_interval=0.001, batch_size=1, compact=False)
+        journal.start()
+        replica = DeliveryJournal(path, compact=False)
+        replica.record('from-replica')
+        replica.close()
+        for n in range(200):
+            journal.record(f"ours-{n}")
+            if n % 50 == 0:
+                await journal.reload()
+            await asyncio.sleep(0)
+        await journal.flush()
+        assert not journal._task.done()  # the flusher survived the reopens
+        assert 'from-replica' in journal
+        journal.close()
+
+    asyncio.run(run())
+    reread = DeliveryJournal(path)
+    assert len(reread) == 201 and 'ours-199' in reread
+    reread.close()
+
+
+def test_old_entries_are_compacted_away(tmp_path):
+    path = tmp_path / 'reminders.journal'
+    path.write_text(f"{time.time() - 10 * 86400:.0f}\told\n{time.time():.0f}\tnew\ntorn")
+    journal = DeliveryJournal(str(path))
+    assert 'new' in journal and 'old' not in journal and len(journal) == 1
+    journal.close()
@@ -0,0 +1,53 @@
+"""Reminder scheduler: background delivery, retry deadlines"""
+import asyncio
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from clock import SimulatedClock
+from schedule import ScheduleIndex, build_reminders
+from scheduler import ReminderScheduler
+
+TZ = ZoneInfo('Europe/Lisbon')
+START = datetime(2025, 1, 15, 16, 50, tzinfo=TZ).astimezone(timezone.utc)  # WET, so local == UTC
+INDEX = ScheduleIndex(build_reminders({'games': [{'name': 'Cabal', 'events': [
+    {'name': 'Nation War', 'times': ['17:00'], 'leads': [5, 1]}]}]}))
+
+
+def run_until(callback, minutes=12):
+    """Step a scheduler on INDEX minute by minute from 16:50 local time"""
+    async def run():
+        clock = SimulatedClock(START)
+        scheduler = ReminderScheduler(INDEX, TZ, lambda r, e: callback(clock, r, e), clock=clock)
+        scheduler.start()
+        await clock.settle()
+        for _ in range(minutes * 6):
+            clock.advance(10)
+            await clock.settle()
+        scheduler.stop()
+
+    asyncio.run(run())
+
+
+def test_a_slow_delivery_does_not_hold_up_the_next_warning():
+    fires = []
+
+    async def callback(clock, reminder, event_utc):
+        fires.append((clock.now().strftime('%H:%M'), reminder.lead))
+        if reminder.lead == 5:
+            await clock.sleep(300)  # a channel stuck retrying 429s until the event starts
+
+    run_until(callback)
+    assert fires == [('16:55', 5), ('16:59', 1)]
+
+
+def test_a_failed_warning_stops_retrying_when_the_next_one_fires():
+    fires = []
+
+    async def callback(clock, reminder, event_utc):
+        fires.append((clock.now().strftime('%H:%M:%S'), reminder.lead))
+        return reminder.lead == 1
+
+    run_until(callback)
+    fives = [at for at, lead in fires if lead == 5]
+    assert fives[0] == '16:55:00' and all(at < '16:59:00' for at in fives) and len(fives) > 1
+    assert fires.count(('16:59:00', 1)) == 1 and fires[-1] == ('16:59:00', 1)
@@ -0,0 +1,23 @@
+"""Shard ownership lookups against the local fake Discord REST API"""
+import asyncio
+
+from broadcast import Broadcaster
+from conftest import fake_api
+from shards import local_channels, parse_shard_ids, shard_of
+
+
+def test_parse_shard_ids():
+    assert parse_shard_ids('0-3,6') == [0, 1, 2, 3, 6]
+    assert parse_shard_ids('') is None
+
+
+def test_local_channels_resolve_concurrently_under_the_global_limit():
+    async def run():
+        async with fake_api(guilds=8, channels_per_guild=2, global_limit=5) as (fake, transport):
+            channel_ids = sorted(fake.channels)
+            fake.forbidden = {channel_ids[0]}
+            local, retry = await local_channels(Broadcaster(transport, global_rate=1000), channel_ids, [0], 2)
+            assert sorted(local) == [c for c in channel_ids[1:] if shard_of(fake.channels[c], 2) == 0]
+            assert retry == []  # no access is final, unlike 429s and server errors
+            assert fake.rate_limited['global'] > 0
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+"""Personal delivery against the local fake Discord REST API"""
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from broadcast import Broadcaster
+from conftest import fake_api
+from schedule import DEFAULT_TEMPLATE, Reminder
+import pytest
+
+from subscriptions import PersonalDelivery, SubscriptionStore, event_key
+
+REMINDER = Reminder('Nation War', 20, 0, 5, 'Cabal', '⚔️', DEFAULT_TEMPLATE)
+
+
+def test_subscribers_follow_one_game_event(tmp_path):
+    store = SubscriptionStore(str(tmp_path / 'subscriptions.db'))
+    try:
+        store.subscribe(1, 'Asia/Manila', [event_key('Cabal', 'World Boss')], 'dm', 0)
+        store.subscribe(2, 'Asia/Manila', [event_key('Other', 'World Boss')], 'dm', 0)
+        store.subscribe(3, 'Asia/Manila', [], 'dm', 0)
+        moment = datetime(2026, 10, 17, 12, tzinfo=timezone.utc)
+        followers = [s.user_id for group in store.by_offset('Cabal', 'World Boss', moment).values() for s in group]
+        assert sorted(followers) == [1, 3]
+    finally:
+        store.close()
+
+
+def test_delivery_reports_subscribers_reached_and_skips_those_done(tmp_path):
+    async def run():
+        store = SubscriptionStore(str(tmp_path / 'subscriptions.db'))
+        try:
+            async with fake_api(guilds=2, channels_per_guild=2) as (fake, transport):
+                allowed, forbidden = fake.guild_channels()[:2]
+                fake.forbidden = {forbidden}
+                for user_id in (1, 2, 3):
+                    store.subscribe(user_id, 'Asia/Manila', [], 'dm', 0)
+                store.subscribe(4, 'Europe/Lisbon', [], 'mention', allowed)
+                store.subscribe(5, 'Europe/Lisbon', [], 'mention', forbidden)
+                personal = PersonalDelivery(store, Broadcaster(transport, global_rate=1000))
+                event_utc = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+                result = await personal.deliver(REMINDER, event_utc, skip=lambda user_id: user_id == 1)
+                assert sorted(result.delivered) == [2, 3, 4]
+                assert result.retry == ()  # 403 in the mention channel: not worth retrying
+                assert sorted(posted.channel_id for posted in fake.posted if posted.channel_id == allowed) == [allowed]
+                assert store.get(2).dm_channel_id is not None and store.get(1).dm_channel_id is None
+        finally:
+            store.close()
+    asyncio.run(run())
+
+
+def test_role_delivery_sends_one_mention_per_channel_role_and_offset(tmp_path):
+    async def run():
+        store = SubscriptionStore(str(tmp_path / 'subscriptions.db'))
+        try:
+            async with fake_api(guilds=1, channels_per_guild=2) as (fake, transport):
+                first, second = fake.guild_channels()
+                for user_id in (1, 2, 3):
+                    store.subscribe(user_id, 'Asia/Manila', [], 'role', first, 77)
+                store.subscribe(4, 'Europe/Lisbon', [], 'role', first, 77)  # another offset, another message
+                store.subscribe(5, 'Asia/Manila', [], 'role', second, 77)
+                personal = PersonalDelivery(store, Broadcaster(transport, global_rate=1000))
+                event_utc = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+                result = await personal.deliver(REMINDER, event_utc, skip=lambda user_id: user_id == 3)
+                assert sorted(result.delivered) == [1, 2, 4, 5]
+                assert sorted(posted.channel_id for posted in fake.posted) == sorted([first, first, second])
+                assert all(posted.content.endswith(' <@&77>') for posted in fake.posted)
+        finally:
+            store.close()
+    asyncio.run(run())
+
+
+def test_role_delivery_needs_a_role_and_old_files_gain_the_column(tmp_path):
+    path = str(tmp_path / 'subscriptions.db')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE subscriptions (user_id INTEGER PRIMARY KEY, timezone TEXT NOT NULL, events TEXT NOT NULL, '
+               'delivery TEXT NOT NULL, channel_id INTEGER, dm_channel_id INTEGER)')
+    db.execute("INSERT INTO subscriptions VALUES (1, 'Asia/Manila', '', 'dm', 0, 42)")
+    db.commit()
+    db.close()
+    store = SubscriptionStore(path)
+    try:
+        assert store.get(1).dm_channel_id == 42 and store.get(1).role_id is None
+        with pytest.raises(ValueError):
+            store.subscribe(2, 'Asia/Manila', [], 'role', 5)
+        with pytest.raises(ValueError):
+            store.subscribe(2, 'Asia/Manila', [], 'mention', 5, 77)
+        store.subscribe(2, 'Asia/Manila', [], 'role', 5, 77)
+    finally:
+        store.close()
+    reopened = SubscriptionStore(path)
+    assert reopened.get(2).role_id == 77 and reopened.get(2).delivery == 'role'
+    reopened.close()